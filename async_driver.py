@@ -0,0 +1,282 @@
+"""Asyncio plotter driver.
+
+A producer compiles the drawing into HPGL a batch of paths at a time on a
+worker thread while a consumer streams the compiled bytes to the device,
+so compiling and serial I/O overlap. The consumer never sends more than
+the plotter says it has room for: it asks for the free buffer space with
+the `ESC . B` device-control instruction and writes at most that much
+before asking again.
+"""
+import asyncio
+import os
+import select
+import termios
+import threading
+import time
+import tty
+import numpy as np
+import hpgl_compiler
+
+BUFFER_SPACE_QUERY = b"\x1b.B"
+# seconds to wait for the plotter to answer a query
+REPLY_TIMEOUT = 5.0
+BAUD_RATES = {
+    1200: termios.B1200,
+    2400: termios.B2400,
+    4800: termios.B4800,
+    9600: termios.B9600,
+    19200: termios.B19200,
+    38400: termios.B38400,
+    }
+
+
+def open_device(path, baud=9600):
+    """Opens a serial device (or pty) in raw, non-blocking mode and
+    returns its file descriptor. `baud` must be one of `BAUD_RATES`.
+    """
+    if baud not in BAUD_RATES:
+        raise ValueError("unsupported baud rate {!r}, expected one of "
+                         "{}".format(baud, sorted(BAUD_RATES)))
+    fd = os.open(path, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+    tty.setraw(fd)
+    attributes = termios.tcgetattr(fd)
+    attributes[4] = attributes[5] = BAUD_RATES[baud]
+    termios.tcsetattr(fd, termios.TCSANOW, attributes)
+    return fd
+
+
+class AsyncDevice:
+    """Non-blocking reads and writes on a file descriptor, driven by the
+    event loop's readiness callbacks. A query the device does not answer
+    within `reply_timeout` seconds raises `TimeoutError`.
+    """
+
+    def __init__(self, fd, reply_timeout=REPLY_TIMEOUT):
+        self.fd = fd
+        self.reply_timeout = reply_timeout
+        os.set_blocking(fd, False)
+        self.loop = asyncio.get_running_loop()
+        self.pending_input = b""
+
+    async def wait(self, add, remove, timeout=None):
+        """Waits until the device is ready, or for at most `timeout`
+        seconds. Returns whether it is ready.
+        """
+        ready = self.loop.create_future()
+
+        def wake():
+            if not ready.done():
+                ready.set_result(None)
+        add(self.fd, wake)
+        try:
+            # asyncio.wait, unlike wait_for, never swallows a cancel
+            # that lands just as the device becomes ready
+            await asyncio.wait([ready], timeout=timeout)
+        finally:
+            remove(self.fd)
+        return ready.done()
+
+    async def write(self, data):
+        data = memoryview(data)
+        while data:
+            try:
+                written = os.write(self.fd, data)
+            except BlockingIOError:
+                written = 0
+            data = data[written:]
+            if data:
+                await self.wait(self.loop.add_writer, self.loop.remove_writer)
+
+    async def read_until(self, terminator=b"\r", timeout=None):
+        """Reads up to the next `terminator`, raising `TimeoutError` if it
+        has not arrived within `timeout` seconds.
+        """
+        deadline = None if timeout is None else self.loop.time() + timeout
+        while terminator not in self.pending_input:
+            remaining = None if deadline is None else max(
+                deadline - self.loop.time(), 0)
+            if not await self.wait(
+                    self.loop.add_reader, self.loop.remove_reader,
+                    remaining):
+                raise TimeoutError(
+                    "no reply within {} s".format(timeout))
+            try:
+                self.pending_input += os.read(self.fd, 256)
+            except BlockingIOError:
+                pass
+        line, _, self.pending_input = self.pending_input.partition(terminator)
+        return line
+
+    async def buffer_space(self):
+        """Asks the plotter how many bytes of buffer it has free."""
+        await self.write(BUFFER_SPACE_QUERY)
+        try:
+            reply = await self.read_until(timeout=self.reply_timeout)
+        except TimeoutError:
+            raise TimeoutError(
+                "plotter did not answer the buffer space query (ESC . B) "
+                "within {} s".format(self.reply_timeout)) from None
+        return int(reply.strip() or 0)
+
+
+def compile_batches(layers, encoding, batch_paths):
+    """Splits a store, or list of (pen, store) layers, into batches of
+    paths and returns a function that compiles batch `i` into HPGL bytes,
+    carrying the pen position across batches for the relative encodings.
+    Only the first batch of a layer selects its pen.
+    """
+    layers = hpgl_compiler.as_layers(layers)
+    batches = [
+        (index, first, min(first + batch_paths, len(store)))
+        for index, (_, store) in enumerate(layers)
+        for first in range(0, len(store), batch_paths)
+    ]
+
+    def compile_batch(i):
+        index, first, end = batches[i]
+        pen, store = layers[index]
+        origin = (0, 0)
+        if i:
+            previous, _, previous_end = batches[i - 1]
+            origin = hpgl_compiler.pen_position(
+                layers[previous][1].select([previous_end - 1]))
+        batch = store.select(np.arange(first, end))
+        return b"".join(hpgl_compiler.iter_layers(
+            [(pen, batch)], encoding=encoding, origin=origin,
+            pen=pen if first else None))
+    return len(batches), compile_batch
+
+
+async def produce(store, queue, encoding, batch_paths):
+    loop = asyncio.get_running_loop()
+    count, compile_batch = compile_batches(store, encoding, batch_paths)
+    await queue.put(hpgl_compiler.prologue(encoding))
+    for i in range(count):
+        await queue.put(await loop.run_in_executor(None, compile_batch, i))
+    await queue.put(hpgl_compiler.epilogue(
+        encoding, hpgl_compiler.as_layers(store)))
+    await queue.put(None)
+
+
+async def consume(device, queue, min_write=64, poll_interval=0.01):
+    """Streams queued HPGL to the device, never writing more than its
+    reported free buffer space. Returns the number of bytes sent.
+    """
+    sent = 0
+    free = 0
+    while True:
+        block = await queue.get()
+        if block is None:
+            return sent
+        block = memoryview(block)
+        while block:
+            if free < min(min_write, len(block)):
+                free = await device.buffer_space()
+                if free < min(min_write, len(block)):
+                    await asyncio.sleep(poll_interval)
+                    continue
+            size = min(free, len(block))
+            await device.write(block[:size])
+            block = block[size:]
+            free -= size
+            sent += size
+
+
+async def plot(store, fd, encoding="absolute", batch_paths=1000,
+               queue_size=8, reply_timeout=REPLY_TIMEOUT):
+    """Plots a store, or list of (pen, store) layers, on the device open
+    at `fd`, overlapping HPGL compilation with serial I/O. Returns the
+    number of bytes sent.
+
+    If compiling or sending fails, the other side is cancelled and the
+    error is raised here.
+    """
+    device = AsyncDevice(fd, reply_timeout=reply_timeout)
+    queue = asyncio.Queue(maxsize=queue_size)
+    producer = asyncio.ensure_future(
+        produce(store, queue, encoding, batch_paths))
+    consumer = asyncio.ensure_future(consume(device, queue))
+    tasks = [producer, consumer]
+    try:
+        done, _ = await asyncio.wait(
+            tasks, return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    for task in done:
+        if task.exception() is not None:
+            raise task.exception()
+    return consumer.result()
+
+
+class PseudoPlotter:
+    """A plotter stand-in on a pseudo-terminal, for exercising the driver
+    without hardware.
+
+    It answers `ESC . B` with its free buffer space and drains its buffer
+    at `bytes_per_second`, the way a real plotter works through queued
+    commands. Everything it drains is kept in `received`; `overflowed`
+    is set if a sender ever wrote more than the buffer could hold.
+    """
+
+    def __init__(self, buffer_size=1024, bytes_per_second=960.0):
+        self.buffer_size = buffer_size
+        self.bytes_per_second = bytes_per_second
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.master)
+        tty.setraw(self.slave)
+        self.device_path = os.ttyname(self.slave)
+        self.buffer = bytearray()
+        self.received = bytearray()
+        self.overflowed = False
+        self.running = True
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def serve(self):
+        last = time.monotonic()
+        incoming = b""
+        while self.running:
+            readable, _, _ = select.select([self.master], [], [], 0.005)
+            now = time.monotonic()
+            drained = int((now - last) * self.bytes_per_second)
+            if drained:
+                self.received += self.buffer[:drained]
+                del self.buffer[:drained]
+                last = now
+            elif not self.buffer:
+                last = now
+            if not readable:
+                continue
+            try:
+                incoming += os.read(self.master, 4096)
+            except OSError:
+                break
+            while incoming:
+                query = incoming.find(BUFFER_SPACE_QUERY)
+                data = incoming if query < 0 else incoming[:query]
+                # hold back a partial escape sequence at the end
+                if query < 0 and incoming.endswith((b"\x1b", b"\x1b.")):
+                    data = incoming[:incoming.rindex(b"\x1b")]
+                self.buffer += data
+                if len(self.buffer) > self.buffer_size:
+                    self.overflowed = True
+                incoming = incoming[len(data):]
+                if query < 0:
+                    break
+                incoming = incoming[len(BUFFER_SPACE_QUERY):]
+                free = max(self.buffer_size - len(self.buffer), 0)
+                os.write(self.master, "{}\r".format(free).encode("ascii"))
+
+    def finish(self, timeout=None):
+        """Waits for the buffer to drain, then stops serving."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.buffer and (deadline is None or time.monotonic() < deadline):
+            time.sleep(0.01)
+        self.running = False
+        self.thread.join()
+        os.close(self.master)
+        os.close(self.slave)
+        return bytes(self.received)
@@ -0,0 +1,184 @@
+"""Benchmarks for the generate -> add -> clip -> preview -> plot paths at
+wall-scale point counts.
+
+    python benchmarks.py --points 50 200 500 1000 --samples 10 \\
+        --output bench_results.json
+
+Each case is timed `--repeat` times and the fastest run is kept. Results
+are written as JSON tagged with the current git commit, so runs from two
+commits can be diffed directly.
+
+    python benchmarks.py --check-startup
+
+only checks that `import sol118` stays under its time budget without
+pulling in the plotting, preview or GUI backends, and exits non-zero if
+it does not.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import sol118
+from plotter import Drawing
+from simulator import SimulatedPlotter
+
+DEFAULT_POINTS = (50, 200, 500, 1000)
+DEFAULT_SAMPLES = (10,)
+IMPORT_BUDGET_SECONDS = 0.5
+# backends that must only load once their output path is used
+LAZY_MODULES = ("chiplotle", "matplotlib", "svgwrite", "asyncio")
+IMPORT_PROBE = """
+import sys, time
+start = time.perf_counter()
+import sol118
+print(time.perf_counter() - start)
+print(",".join(m for m in {!r} if m in sys.modules))
+"""
+
+
+def best_time(function, repeat, setup=None):
+    """Fastest of `repeat` calls to `function`, in seconds. When `setup`
+    is given, its result is passed to `function` and is not timed.
+    """
+    times = []
+    for _ in range(repeat):
+        argument = setup() if setup else None
+        start = time.perf_counter()
+        function(argument)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def bench_case(point_count, samples, repeat, directory):
+    """Times every stage for one point count and sample count."""
+    lines = sol118.generate_lines(0, point_count, samples)
+    filled = Drawing()
+    filled.add_lines(lines)
+    filled.dedupe()
+
+    def fresh_drawing():
+        drawing = Drawing()
+        drawing.store = filled.store.select(np.arange(len(filled.store)))
+        return drawing
+
+    def run(_):
+        cwd = os.getcwd()
+        os.chdir(directory)
+        try:
+            sol118.run(0, point_count=point_count, samples=samples)
+        finally:
+            os.chdir(cwd)
+
+    def add(_):
+        Drawing().add_lines(lines)
+
+    def clip(drawing):
+        drawing.clip_to_plotter_bounds()
+
+    def preview(_):
+        filled.preview(os.path.join(directory, "bench.svg"))
+
+    def compile_hpgl(_):
+        filled.compile_hpgl()
+
+    def compile_plot(_):
+        filled.plotter = SimulatedPlotter()
+        filled.plot()
+
+    results = {
+        "points": point_count,
+        "samples": samples,
+        "lines": len(filled.store),
+        "vertices": filled.store.vertex_count,
+        }
+    for name, function, setup in (
+            ("run", run, None),
+            ("add", add, None),
+            ("clip_to_plotter_bounds", clip, fresh_drawing),
+            ("preview", preview, None),
+            ("compile_hpgl", compile_hpgl, None),
+            ("plot_compile", compile_plot, None)):
+        results[name] = best_time(function, repeat, setup)
+    return results
+
+
+def import_time(repeat=5):
+    """Fastest time to `import sol118` in a fresh interpreter, and the
+    lazy backends that import loaded anyway.
+    """
+    times = []
+    loaded = ""
+    for _ in range(repeat):
+        output = subprocess.check_output(
+            [sys.executable, "-c", IMPORT_PROBE.format(LAZY_MODULES)],
+            cwd=os.path.dirname(os.path.abspath(__file__)))
+        seconds, loaded = output.decode().split("\n")[:2]
+        times.append(float(seconds))
+    return min(times), [name for name in loaded.split(",") if name]
+
+
+def check_startup(budget=IMPORT_BUDGET_SECONDS):
+    seconds, loaded = import_time()
+    print("import sol118: {:.3f}s (budget {:.3f}s)".format(seconds, budget))
+    if loaded:
+        print("backends loaded at import:", ", ".join(loaded))
+    return seconds <= budget and not loaded
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"],
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--points", type=int, nargs="+",
+                        default=DEFAULT_POINTS)
+    parser.add_argument("--samples", type=int, nargs="+",
+                        default=DEFAULT_SAMPLES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--check-startup", action="store_true")
+    parser.add_argument("--startup-budget", type=float,
+                        default=IMPORT_BUDGET_SECONDS)
+    args = parser.parse_args()
+    if args.check_startup:
+        sys.exit(0 if check_startup(args.startup_budget) else 1)
+
+    cases = []
+    with tempfile.TemporaryDirectory() as directory:
+        os.mkdir(os.path.join(directory, "previews"))
+        for point_count in args.points:
+            for samples in args.samples:
+                case = bench_case(point_count, samples, args.repeat, directory)
+                print(" ".join(
+                    "{}={:.4f}".format(key, value)
+                    if isinstance(value, float) else
+                    "{}={}".format(key, value)
+                    for key, value in case.items()))
+                cases.append(case)
+
+    with open(args.output, "w") as f:
+        json.dump({
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "repeat": args.repeat,
+            "import_seconds": import_time()[0],
+            "cases": cases,
+            }, f, indent=2)
+    print("wrote", args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+import numpy as np
+from store import PathStore
+
+DEFAULT_DIRECTORY = ".cache/drawings"
+DEFAULT_MAX_BYTES = 2 << 30
+
+
+def save_store(store, prefix):
+    """Writes a store as `<prefix>.coords.npy` and `<prefix>.offsets.npy`.
+    Each file is written under a temporary name and moved into place, so
+    a reader never sees half a drawing.
+    """
+    for suffix, array in ((".coords.npy", store.coords),
+                          (".offsets.npy", store.offsets)):
+        temporary = prefix + suffix + ".tmp"
+        with open(temporary, "wb") as f:
+            np.save(f, np.ascontiguousarray(array))
+        os.replace(temporary, prefix + suffix)
+
+
+def load_store(prefix):
+    """Memory-maps a store written by `save_store`."""
+    coords = np.load(prefix + ".coords.npy", mmap_mode="r")
+    offsets = np.load(prefix + ".offsets.npy", mmap_mode="r")
+    return PathStore.from_arrays(coords, offsets)
+
+
+class DrawingCache:
+    """Content-addressed on-disk cache of generated drawings.
+
+    Entries are keyed by a hash of the parameters that produced them and
+    loaded back by memory mapping, so a cached drawing is available
+    without regenerating or even reading all of it. When the cache grows
+    past `max_bytes`, the least recently used entries are evicted.
+    """
+
+    def __init__(self, directory=DEFAULT_DIRECTORY,
+                 max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, **params):
+        text = json.dumps(params, sort_keys=True)
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def prefix(self, key):
+        return os.path.join(self.directory, key)
+
+    def entry_files(self, key):
+        prefix = self.prefix(key)
+        return [prefix + ".coords.npy", prefix + ".offsets.npy"]
+
+    def get(self, **params):
+        """Returns the cached store for `params`, or None."""
+        key = self.key(**params)
+        files = self.entry_files(key)
+        if not all(os.path.exists(path) for path in files):
+            return None
+        for path in files:
+            # mark as recently used
+            os.utime(path)
+        return load_store(self.prefix(key))
+
+    def put(self, store, **params):
+        key = self.key(**params)
+        save_store(store, self.prefix(key))
+        self.evict(keep=key)
+        return key
+
+    def entries(self):
+        """Returns (last used, size in bytes, key) for every entry."""
+        entries = {}
+        for name in os.listdir(self.directory):
+            if not name.endswith(".npy"):
+                continue
+            key = name.split(".", 1)[0]
+            stat = os.stat(os.path.join(self.directory, name))
+            used, size = entries.get(key, (0, 0))
+            entries[key] = (max(used, stat.st_mtime), size + stat.st_size)
+        return [(used, size, key) for key, (used, size) in entries.items()]
+
+    def evict(self, keep=None):
+        """Deletes least recently used entries until the cache fits in
+        `max_bytes`. The entry `keep` is never evicted.
+        """
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for used, size, key in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            for path in self.entry_files(key):
+                if os.path.exists(path):
+                    os.remove(path)
+            total -= size
+
+    def clear(self):
+        for _, _, key in self.entries():
+            for path in self.entry_files(key):
+                if os.path.exists(path):
+                    os.remove(path)
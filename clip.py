@@ -0,0 +1,107 @@
+import numpy as np
+from store import PathStore
+
+INSIDE = 0
+OUTSIDE = 1
+CROSSING = 2
+
+
+def classify(store, bounds):
+    """Sorts every path of a store by its bounding box against the
+    axis-aligned `bounds` (minx, miny, maxx, maxy): INSIDE, OUTSIDE, or
+    CROSSING when it may touch both sides.
+    """
+    minx, miny, maxx, maxy = bounds
+    boxes = store.bounding_boxes()
+    inside = (boxes[:, 0] >= minx) & (boxes[:, 1] >= miny) & \
+        (boxes[:, 2] <= maxx) & (boxes[:, 3] <= maxy)
+    outside = (boxes[:, 2] < minx) | (boxes[:, 3] < miny) | \
+        (boxes[:, 0] > maxx) | (boxes[:, 1] > maxy)
+    return np.where(inside, INSIDE, np.where(outside, OUTSIDE, CROSSING))
+
+
+def liang_barsky(starts, ends, bounds):
+    """Clips segments against an axis-aligned box.
+
+    Returns the parameters `t0` and `t1` of the visible part of every
+    segment (`start + t * (end - start)`); the segment is hidden where
+    `t0 > t1`.
+    """
+    minx, miny, maxx, maxy = bounds
+    deltas = ends - starts
+    t0 = np.zeros(len(starts))
+    t1 = np.ones(len(starts))
+    edges = (
+        (-deltas[:, 0], starts[:, 0] - minx),
+        (deltas[:, 0], maxx - starts[:, 0]),
+        (-deltas[:, 1], starts[:, 1] - miny),
+        (deltas[:, 1], maxy - starts[:, 1]),
+        )
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for p, q in edges:
+            ratio = q / p
+            parallel = p == 0
+            # a segment parallel to an edge and outside it is hidden
+            t1 = np.where(parallel & (q < 0), -1.0, t1)
+            entering = ~parallel & (p < 0)
+            leaving = ~parallel & (p > 0)
+            t0 = np.where(entering, np.maximum(t0, ratio), t0)
+            t1 = np.where(leaving, np.minimum(t1, ratio), t1)
+    return t0, t1
+
+
+def clip_paths(store, bounds):
+    """Clips every path of a store to `bounds` segment by segment.
+
+    Returns the visible pieces as a new store, together with the index of
+    the path each piece came from. A path that leaves and re-enters the
+    box becomes several pieces.
+    """
+    coords = store.coords
+    offsets = store.offsets
+    owners = np.repeat(np.arange(len(store)), np.diff(offsets))
+    is_start = np.ones(len(coords), dtype=bool)
+    is_start[offsets[1:] - 1] = False
+    segment_starts = np.nonzero(is_start)[0]
+    starts = coords[segment_starts]
+    ends = coords[segment_starts + 1]
+    owner = owners[segment_starts]
+    t0, t1 = liang_barsky(starts, ends, bounds)
+    visible = t0 <= t1
+    starts, ends, owner = starts[visible], ends[visible], owner[visible]
+    t0, t1 = t0[visible], t1[visible]
+    segment_starts = segment_starts[visible]
+    deltas = ends - starts
+    clipped_starts = starts + deltas * t0[:, None]
+    clipped_ends = starts + deltas * t1[:, None]
+
+    # a segment continues the previous piece when both are visible,
+    # adjacent in the same path and unclipped where they meet
+    continues = np.zeros(len(owner), dtype=bool)
+    continues[1:] = (segment_starts[1:] == segment_starts[:-1] + 1) & \
+        (owner[1:] == owner[:-1]) & (t1[:-1] == 1) & (t0[1:] == 0)
+    new_piece = ~continues
+    vertex_counts = 1 + new_piece
+    positions = np.cumsum(vertex_counts) - vertex_counts
+    result = np.empty((int(vertex_counts.sum()), 2))
+    result[positions[new_piece]] = clipped_starts[new_piece]
+    result[positions + vertex_counts - 1] = clipped_ends
+    piece_offsets = np.append(positions[new_piece], len(result))
+    return PathStore.from_arrays(result, piece_offsets), owner[new_piece]
+
+
+def clip(store, bounds):
+    """Clips a store to an axis-aligned box, keeping paths that lie
+    fully inside untouched and dropping those fully outside without
+    looking at their segments.
+    """
+    kinds = classify(store, bounds)
+    inside = np.nonzero(kinds == INSIDE)[0]
+    crossing = np.nonzero(kinds == CROSSING)[0]
+    if not len(crossing):
+        return store.select(inside)
+    pieces, piece_owners = clip_paths(store.select(crossing), bounds)
+    combined = store.select(inside)
+    combined.extend_ragged(pieces.coords, pieces.offsets)
+    owners = np.concatenate([inside, crossing[piece_owners]])
+    return combined.select(np.argsort(owners, kind='stable'))
@@ -0,0 +1,144 @@
+import numpy as np
+
+
+def canonical_paths(paths):
+    """Flips each path in an (n, k, 2) array so that it reads the same
+    way as its reverse would, making A -> B and B -> A identical.
+    """
+    reverse = paths[:, ::-1]
+    flat, flat_reverse = paths.reshape(len(paths), -1), \
+        reverse.reshape(len(paths), -1)
+    first_difference = np.argmax(flat != flat_reverse, axis=1)
+    rows = np.arange(len(paths))
+    flip = flat_reverse[rows, first_difference] < flat[rows, first_difference]
+    return np.where(flip[:, None, None], reverse, paths)
+
+
+def unique_path_indices(store, tolerance=1.0):
+    """Returns the indices, in insertion order, of the first occurrence of
+    every distinct path in a store.
+
+    Vertices are rounded to a `tolerance` grid before comparing, and a
+    path drawn backwards counts as a duplicate of the forward one. Only
+    paths whose vertices round to the same grid points are duplicates:
+    two paths closer than `tolerance` but on opposite sides of a
+    rounding boundary are both kept.
+    """
+    lengths = store.lengths()
+    offsets = store.offsets
+    snapped = np.round(store.coords / tolerance).astype(np.int64)
+    keep = []
+    for length in np.unique(lengths):
+        members = np.nonzero(lengths == length)[0]
+        source = offsets[members][:, None] + np.arange(length)
+        paths = canonical_paths(snapped[source])
+        _, first = np.unique(
+            paths.reshape(len(members), -1), axis=0, return_index=True)
+        keep.append(members[first])
+    if not keep:
+        return np.zeros(0, dtype=np.int64)
+    return np.sort(np.concatenate(keep))
+
+
+def straight_paths(store, tolerance=1.0):
+    """Returns a boolean mask of the paths whose vertices all lie within
+    `tolerance` of the line between their first and last vertex.
+    """
+    offsets = store.offsets
+    coords = store.coords
+    lengths = np.diff(offsets)
+    firsts = coords[offsets[:-1]]
+    lasts = coords[offsets[1:] - 1]
+    direction = lasts - firsts
+    length = np.hypot(direction[:, 0], direction[:, 1])
+    straight = length > tolerance
+    owner = np.repeat(np.arange(len(lengths)), lengths)
+    relative = coords - firsts[owner]
+    cross = np.abs(
+        relative[:, 0] * direction[owner, 1] -
+        relative[:, 1] * direction[owner, 0])
+    off_line = cross > tolerance * np.maximum(length[owner], tolerance)
+    straight[owner[off_line]] = False
+    return straight
+
+
+def merge_collinear(store, tolerance=1.0):
+    """Merges straight paths that lie on the same line and overlap (or
+    touch) within `tolerance` into single two-vertex segments.
+
+    Returns a new store; paths that are not straight, or that do not
+    overlap anything, are kept as they were.
+    """
+    straight = np.nonzero(straight_paths(store, tolerance))[0]
+    if len(straight) < 2:
+        return store
+    offsets = store.offsets
+    coords = store.coords
+    firsts = coords[offsets[:-1][straight]]
+    lasts = coords[offsets[1:][straight] - 1]
+    direction = lasts - firsts
+    direction /= np.hypot(direction[:, 0], direction[:, 1])[:, None]
+    # a line's angle only matters modulo pi; the bin at pi is the bin at
+    # 0, so lines either side of that seam (say vertical ones whose x
+    # is off by float noise) share a bin and a direction
+    reach = float(np.abs(coords).max()) or 1.0
+    raw_angle = np.arctan2(direction[:, 1], direction[:, 0])
+    angle = raw_angle % np.pi
+    angle_bins = np.round(angle * reach / tolerance).astype(np.int64)
+    half_turn = max(int(np.round(np.pi * reach / tolerance)), 1)
+    wrapped = angle_bins >= half_turn
+    angle_bins[wrapped] -= half_turn
+    direction[(raw_angle != angle) ^ wrapped] *= -1
+    normal = np.stack([-direction[:, 1], direction[:, 0]], axis=1)
+    offset = (normal * firsts).sum(axis=1)
+    keys = np.stack([
+        angle_bins,
+        np.round(offset / tolerance).astype(np.int64),
+        ], axis=1)
+    starts = (direction * firsts).sum(axis=1)
+    ends = (direction * lasts).sum(axis=1)
+    lows, highs = np.minimum(starts, ends), np.maximum(starts, ends)
+
+    _, groups = np.unique(keys, axis=0, return_inverse=True)
+    groups = groups.ravel()
+    replaced = np.zeros(len(store), dtype=bool)
+    merged = []
+    order = np.lexsort((lows, groups))
+    run = [order[0]]
+    run_high = highs[order[0]]
+    for index in list(order[1:]) + [None]:
+        if index is not None and groups[index] == groups[run[-1]] and \
+                lows[index] <= run_high + tolerance:
+            run.append(index)
+            run_high = max(run_high, highs[index])
+            continue
+        if len(run) > 1:
+            run = np.array(run)
+            replaced[straight[run]] = True
+            line_direction = direction[run].mean(axis=0)
+            line_direction /= np.hypot(*line_direction)
+            line_normal = np.array([-line_direction[1], line_direction[0]])
+            base = line_normal * offset[run].mean()
+            merged.append([
+                base + line_direction * lows[run].min(),
+                base + line_direction * highs[run].max(),
+                ])
+        if index is not None:
+            run = [index]
+            run_high = highs[index]
+
+    if not merged:
+        return store
+    result = store.select(np.nonzero(~replaced)[0])
+    result.extend(np.array(merged))
+    return result
+
+
+def dedupe(store, tolerance=1.0, merge=False):
+    """Drops exact and reversed duplicate paths from a store and, if
+    `merge` is set, merges overlapping collinear segments.
+    """
+    result = store.select(unique_path_indices(store, tolerance))
+    if merge:
+        result = merge_collinear(result, tolerance)
+    return result
@@ -0,0 +1,258 @@
+import numpy as np
+
+PD_THRESHOLD = 300
+BLOCK_SIZE = 1 << 16
+ENCODINGS = ("absolute", "relative", "pe", "pe7")
+
+# HP-GL/2 polyline encoding: (bits per digit, first non-terminating
+# character, first terminating character) for 8-bit and 7-bit links
+PE_BASES = {
+    "pe": (6, 63, 191),
+    "pe7": (5, 63, 95),
+    }
+
+
+def as_layers(paths):
+    """Returns `paths` as a list of (pen, store) layers. A bare store is
+    a single layer drawn with whatever pen is already loaded (pen None).
+    """
+    if hasattr(paths, "offsets"):
+        return [(None, paths)]
+    return list(paths)
+
+
+def compile_paths(store, threshold=PD_THRESHOLD, encoding="absolute"):
+    """Compiles every path in a store, or in a list of (pen, store)
+    layers, into one HPGL byte stream.
+
+    With the default "absolute" encoding each path becomes the same
+    commands `Drawing.plot_coords` sends: a pen-up move to its first
+    vertex, pen-down runs of at most `threshold` coordinates, and a
+    pen-up at its last vertex. "relative" sends the same moves as `PR`
+    deltas, and "pe" / "pe7" pack them into a single HP-GL/2 `PE`
+    polyline-encoded command (8-bit or 7-bit safe). Coordinates are
+    rounded to whole plotter units.
+    """
+    return b"".join(iter_stream(store, threshold, encoding))
+
+
+def iter_stream(store, threshold=PD_THRESHOLD, encoding="absolute"):
+    """Yields the complete HPGL stream for a store or list of layers: the
+    encoding's prologue, the bytes of every path, then the epilogue. If
+    any layer selected a pen, the pen is put back with `SP0;` at the end.
+    """
+    layers = as_layers(store)
+    yield prologue(encoding)
+    for chunk in iter_layers(layers, threshold, encoding):
+        yield chunk
+    yield epilogue(encoding, layers)
+
+
+def select_pen(pen):
+    """The `SP` instruction for a pen, or nothing for pen None."""
+    if pen is None:
+        return b""
+    return "SP{};".format(pen).encode("ascii")
+
+
+def iter_layers(layers, threshold=PD_THRESHOLD, encoding="absolute",
+                origin=(0, 0), pen=None):
+    """Yields the HPGL bytes for each path of a list of (pen, store)
+    layers, in order, like `iter_compiled_paths` does for one store.
+
+    The first path of a layer is prefixed with the pen change when its
+    pen differs from the one in the holder (`pen` to begin with), so
+    there is still exactly one chunk per path. The relative encodings
+    leave their mode around the `SP` and pick up again at the pen
+    position.
+    """
+    position = origin
+    for layer_pen, store in layers:
+        if not len(store):
+            continue
+        change = b""
+        if layer_pen is not None and layer_pen != pen:
+            change = select_pen(layer_pen)
+            if encoding != "absolute":
+                change = epilogue(encoding) + change + \
+                    prologue(encoding, position)
+            pen = layer_pen
+        chunks = iter_compiled_paths(store, threshold, encoding, position)
+        yield change + next(chunks)
+        for chunk in chunks:
+            yield chunk
+        position = pen_position(store)
+
+
+def prologue(encoding="absolute", origin=(0, 0)):
+    """Bytes that put the plotter into the state an encoding expects,
+    with the pen up at `origin` for the relative encodings.
+    """
+    if encoding == "absolute":
+        return b""
+    move = "PU;PA{},{};".format(*origin).encode("ascii")
+    if encoding == "relative":
+        return move + b"PR;"
+    return move + b"PE" + (b"7" if encoding == "pe7" else b"")
+
+
+def epilogue(encoding="absolute", layers=()):
+    """Bytes that return the plotter to absolute plotting, and put the
+    pen away if any of `layers` selected one.
+    """
+    end = b""
+    if any(pen is not None for pen, _ in layers):
+        end = select_pen(0)
+    if encoding == "absolute":
+        return end
+    if encoding == "relative":
+        return b"PA;" + end
+    return b";" + end
+
+
+def iter_compiled_paths(store, threshold=PD_THRESHOLD, encoding="absolute",
+                        origin=(0, 0)):
+    """Yields the HPGL bytes for each path in a store, in order.
+
+    Relative and polyline-encoded paths only make sense after the
+    encoding's `prologue`, with the pen starting at `origin` (whole
+    plotter units) -- the origin itself, or the last vertex of the
+    previous store when a job is compiled a store at a time.
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError("unknown HPGL encoding {!r}".format(encoding))
+    numbers = np.rint(store.coords).astype(np.int64)
+    offsets = store.offsets.tolist()
+    if encoding == "absolute":
+        text = numbers.ravel().astype(str).tolist()
+        for start, end in zip(offsets[:-1], offsets[1:]):
+            yield compile_path(text, start, end, threshold).encode("ascii")
+        return
+    deltas = np.diff(
+        numbers, axis=0, prepend=np.array([origin], dtype=np.int64))
+    if encoding == "relative":
+        text = deltas.ravel().astype(str).tolist()
+        for start, end in zip(offsets[:-1], offsets[1:]):
+            yield compile_relative_path(
+                text, start, end, threshold).encode("ascii")
+        return
+    encoded, lengths = encode_pe_numbers(deltas.ravel(), *PE_BASES[encoding])
+    # byte offset of every path's first number, plus the end sentinel
+    bounds = np.concatenate([[0], np.cumsum(lengths)])[
+        np.asarray(offsets) * 2].tolist()
+    data = encoded.tobytes()
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        yield b"<" + data[start:end]
+
+
+def pen_position(store):
+    """Where the pen ends up after plotting a store, in whole plotter
+    units; the `origin` to compile the next store of a job from.
+    """
+    last = np.rint(store.coords[-1]).astype(np.int64)
+    return int(last[0]), int(last[1])
+
+
+def compile_path(text, start, end, threshold=PD_THRESHOLD):
+    """HPGL for the vertices `start:end` given a flat list of already
+    formatted x, y numbers.
+    """
+    commands = ["PU{},{};".format(text[start * 2], text[start * 2 + 1])]
+    while end - start > threshold:
+        commands.append(
+            "PD" + ",".join(text[start * 2:(start + threshold) * 2]) + ";")
+        start += threshold
+    commands.append("PD" + ",".join(text[start * 2:end * 2]) + ";")
+    commands.append("PU{},{};".format(text[end * 2 - 2], text[end * 2 - 1]))
+    return "".join(commands)
+
+
+def compile_relative_path(text, start, end, threshold=PD_THRESHOLD):
+    """Relative-mode HPGL for the vertices `start:end` given a flat list
+    of formatted x, y deltas from the previous vertex in the stream.
+    """
+    commands = ["PU{},{};".format(text[start * 2], text[start * 2 + 1])]
+    start += 1
+    if start == end:
+        commands.append("PD;")
+    while start < end:
+        stop = min(start + threshold, end)
+        commands.append("PD" + ",".join(text[start * 2:stop * 2]) + ";")
+        start = stop
+    commands.append("PU;")
+    return "".join(commands)
+
+
+def encode_pe_numbers(values, bits, digit, terminator):
+    """Encodes integers in HP-GL/2 `PE` form.
+
+    Each value is zigzag encoded (2v for v >= 0, 2|v| + 1 otherwise) and
+    written least significant digit first, `bits` bits per character,
+    with the last digit taken from the terminating character range.
+
+    Returns the encoded bytes as a uint8 array and the number of bytes
+    used by each value.
+    """
+    values = np.asarray(values, dtype=np.int64)
+    zigzag = np.where(values >= 0, values * 2, values * -2 + 1).astype(
+        np.uint64)
+    width = max(1, -(-int(zigzag.max(initial=0)).bit_length() // bits))
+    shifts = np.arange(width, dtype=np.uint64) * np.uint64(bits)
+    digits = (zigzag[:, None] >> shifts) & np.uint64((1 << bits) - 1)
+    lengths = np.maximum(
+        1, ((zigzag[:, None] >> shifts) > 0).sum(axis=1)).astype(np.int64)
+    position = np.arange(width)
+    chars = digits.astype(np.int64) + np.where(
+        position == lengths[:, None] - 1, terminator, digit)
+    encoded = chars[position < lengths[:, None]].astype(np.uint8)
+    return encoded, lengths
+
+
+def encoding_report(store, encoding="absolute", threshold=PD_THRESHOLD):
+    """Size of a store's (or list of layers') compiled stream in a given
+    encoding.
+    """
+    size = sum(len(chunk) for chunk in iter_stream(store, threshold, encoding))
+    vertices = sum(layer.vertex_count for _, layer in as_layers(store))
+    return {
+        "encoding": encoding,
+        "bytes": size,
+        "vertices": vertices,
+        "bytes_per_vertex": size / float(vertices) if vertices else 0.0,
+        }
+
+
+def write_blocks(chunks, sink, block_size=BLOCK_SIZE):
+    """Writes an iterable of byte strings to a file-like `sink` in blocks
+    of roughly `block_size` bytes. Returns the number of bytes written.
+    """
+    pending = []
+    pending_size = 0
+    written = 0
+    for chunk in chunks:
+        pending.append(chunk)
+        pending_size += len(chunk)
+        if pending_size >= block_size:
+            sink.write(b"".join(pending))
+            written += pending_size
+            pending, pending_size = [], 0
+    if pending:
+        sink.write(b"".join(pending))
+        written += pending_size
+    if hasattr(sink, "flush"):
+        sink.flush()
+    return written
+
+
+def spool(store, sink, threshold=PD_THRESHOLD, block_size=BLOCK_SIZE,
+          encoding="absolute"):
+    """Compiles a store, or list of layers, straight into `sink`, which
+    may be a file path or any file-like object with a binary `write` (an
+    open file, an `io.BytesIO`, a serial port). Returns the number of
+    bytes written.
+    """
+    chunks = iter_stream(store, threshold, encoding)
+    if isinstance(sink, str):
+        with open(sink, "wb") as f:
+            return write_blocks(chunks, f, block_size)
+    return write_blocks(chunks, sink, block_size)
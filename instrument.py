@@ -0,0 +1,83 @@
+import json
+import resource
+import sys
+import time
+from contextlib import contextmanager
+
+
+class Instrumentation:
+    """Collects per-stage wall time and named counters for one run and
+    turns them into a JSON report.
+
+    Stages can repeat; their times add up. Peak memory is the process's
+    maximum resident set size, so it costs nothing to track.
+    """
+
+    enabled = True
+
+    def __init__(self, **context):
+        self.context = context
+        self.stages = {}
+        self.counters = {}
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + \
+                time.perf_counter() - start
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def peak_memory(self):
+        """Peak resident memory of this process, in bytes."""
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS reports bytes
+        return peak if sys.platform == "darwin" else peak * 1024
+
+    def report(self):
+        return dict(
+            self.context,
+            total_seconds=time.perf_counter() - self.started,
+            stages=dict(self.stages),
+            counters=dict(self.counters),
+            peak_memory_bytes=self.peak_memory(),
+            )
+
+    def write_report(self, filepath):
+        with open(filepath, "w") as f:
+            json.dump(self.report(), f, indent=2, sort_keys=True)
+        return filepath
+
+
+class NullInstrumentation:
+    """Stands in for `Instrumentation` when nothing is being measured.
+    Every call is a no-op, so instrumented code pays almost nothing.
+    """
+
+    enabled = False
+
+    class _NullStage:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            return False
+
+    _null_stage = _NullStage()
+
+    def stage(self, name):
+        return self._null_stage
+
+    def count(self, name, value=1):
+        pass
+
+    def report(self):
+        return {}
+
+
+NULL = NullInstrumentation()
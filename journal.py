@@ -0,0 +1,84 @@
+import hashlib
+import os
+from hpgl_compiler import as_layers
+
+
+def job_id(paths, encoding="absolute"):
+    """Identifies a plot job by the paths it draws -- a store, or a list
+    of (pen, store) layers -- the pens they are drawn with and how they
+    are encoded, so a journal is never resumed against a different
+    drawing.
+    """
+    layers = as_layers(paths)
+    digest = hashlib.sha256(encoding.encode("ascii"))
+    if any(pen is not None for pen, _ in layers):
+        digest.update(repr(
+            [(pen, len(store)) for pen, store in layers]).encode("ascii"))
+    for _, store in layers:
+        digest.update(store.offsets.tobytes())
+        digest.update(store.coords.tobytes())
+    return digest.hexdigest()
+
+
+class PlotJournal:
+    """Append-only record of how far a plot job got.
+
+    The first line is the job id; after that, one line per path that has
+    been sent to the plotter, in order. Lines are flushed as they are
+    written and synced to disk every `sync_every` paths, so after a crash
+    the journal lags what was sent by at most that many paths.
+    """
+
+    def __init__(self, filepath, sync_every=50):
+        self.filepath = filepath
+        self.sync_every = sync_every
+        self.file = None
+        self.unsynced = 0
+
+    def read(self):
+        """Returns the job id in the journal and how many paths were
+        completed, or (None, 0) if there is no journal yet.
+        """
+        if not os.path.exists(self.filepath):
+            return None, 0
+        with open(self.filepath) as f:
+            lines = f.read().split("\n")
+        job = lines[0] or None
+        # a torn last line is not a completed path
+        done = [line for line in lines[1:-1] if line.isdigit()]
+        return job, int(done[-1]) + 1 if done else 0
+
+    def start(self, job):
+        """Begins a new journal for `job`, discarding any old one."""
+        self.file = open(self.filepath, "w")
+        self.file.write(job + "\n")
+        self.sync()
+
+    def resume(self, job):
+        """Reopens the journal of `job` and returns the number of paths
+        already completed.
+        """
+        recorded, completed = self.read()
+        if recorded != job:
+            raise ValueError(
+                "journal {} belongs to a different plot job".format(
+                    self.filepath))
+        self.file = open(self.filepath, "a")
+        return completed
+
+    def record(self, index):
+        self.file.write("{}\n".format(index))
+        self.file.flush()
+        self.unsynced += 1
+        if self.unsynced >= self.sync_every:
+            self.sync()
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+
+    def close(self):
+        if self.file and not self.file.closed:
+            self.sync()
+            self.file.close()
@@ -0,0 +1,123 @@
+import numpy as np
+from store import PathStore
+import raster
+import simplify
+from svg_stream import SVG_HEADER, attributes, rect_markup
+
+# how far, in pixels, merged vertices may stray from the original lines
+PIXEL_TOLERANCE = 0.5
+
+
+class Thumbnail:
+    """Level-of-detail preview of a drawing at a fixed on-screen size.
+
+    Paths are mapped to pixels, simplified to within half a pixel, and
+    their segments snapped to pixel centres, which drops segments that
+    repeat one already seen. A segment is then kept only if it inks a
+    pixel that no kept segment of the same colour inks yet, longest
+    segments first. Every pixel the full drawing would touch is still
+    touched, but each kept segment owns at least one pixel, so the
+    number of segments written is bounded by the pixel count rather
+    than by the size of the drawing.
+
+    Stores can be added a batch at a time, so streamed drawings work
+    too.
+    """
+
+    def __init__(self, viewbox, width, height):
+        self.canvas = raster.Raster(viewbox, width, height)
+        self.width = self.canvas.width
+        self.height = self.canvas.height
+        # stroke -> pixels already inked in that colour
+        self.covered = {}
+        # stroke -> kept segments as (n, 4) integer pixel coordinates
+        self.segments = {}
+        self.segments_in = 0
+
+    def segment_count(self):
+        return sum(len(kept) for kept in self.segments.values())
+
+    def add_store(self, store, stroke="black"):
+        """Adds the paths of a store, given in plotter units."""
+        if not len(store):
+            return
+        pixels = PathStore.from_arrays(
+            self.canvas.to_pixels(store.coords), store.offsets)
+        pixels = simplify.compact(pixels, PIXEL_TOLERANCE)
+        coords = np.floor(pixels.coords).astype(np.int64)
+        offsets = pixels.offsets
+        # a segment starts at every vertex that is not the last of its
+        # path; a single-vertex path is a segment from the vertex to itself
+        is_start = np.ones(len(coords), dtype=bool)
+        is_start[offsets[1:] - 1] = False
+        starts = np.nonzero(is_start)[0]
+        single = offsets[:-1][np.diff(offsets) == 1]
+        segments = np.vstack([
+            np.hstack([coords[starts], coords[starts + 1]]),
+            np.hstack([coords[single], coords[single]]),
+            ])
+        self.segments_in += len(segments)
+        self.add_segments(segments, stroke)
+
+    def add_segments(self, segments, stroke):
+        # draw direction does not matter for a preview
+        flip = (segments[:, 0] > segments[:, 2]) | (
+            (segments[:, 0] == segments[:, 2]) &
+            (segments[:, 1] > segments[:, 3]))
+        segments = np.where(flip[:, None], segments[:, [2, 3, 0, 1]],
+                            segments)
+        segments = np.unique(segments, axis=0)
+        lengths = np.abs(segments[:, 2:] - segments[:, :2]).max(axis=1)
+        segments = segments[np.argsort(-lengths, kind="stable")]
+        if stroke not in self.covered:
+            self.covered[stroke] = np.zeros(
+                self.width * self.height, dtype=bool)
+            self.segments[stroke] = np.zeros((0, 4), dtype=np.int64)
+        covered = self.covered[stroke]
+        keep = np.zeros(len(segments), dtype=bool)
+        # sample at pixel centres
+        centres = segments + 0.5
+        for owner, samples in raster.iter_segment_samples(
+                centres[:, :2], centres[:, 2:]):
+            flat = self.canvas.pixel_index(samples)
+            fresh = (flat >= 0) & ~covered[np.maximum(flat, 0)]
+            # samples come in segment order, so the first segment to
+            # reach a fresh pixel is the longest one that does
+            _, first = np.unique(flat[fresh], return_index=True)
+            keep[owner[fresh][first]] = True
+            drawn = keep[owner] & (flat >= 0)
+            covered[flat[drawn]] = True
+        self.segments[stroke] = np.vstack(
+            [self.segments[stroke], segments[keep]])
+
+    def write_svg(self, filepath, paper=None):
+        """Writes the kept segments as one `<path>` per colour, in pixel
+        coordinates, on top of the paper rectangle (plotter units) if
+        given.
+        """
+        with open(filepath, "w") as f:
+            f.write(SVG_HEADER.format(
+                width="{}px".format(self.width),
+                height="{}px".format(self.height),
+                style="background-color: #ccc",
+                viewbox="0,0,{},{}".format(self.width, self.height)))
+            if paper is not None:
+                x, y, width, height = paper
+                corners = np.floor(self.canvas.to_pixels(
+                    [(x, y), (x + width, y + height)]))
+                left, right = sorted(corners[:, 0])
+                top, bottom = sorted(corners[:, 1])
+                f.write(rect_markup(
+                    int(left), int(top), int(right - left),
+                    int(bottom - top), fill="white"))
+            f.write('<g transform="translate(0.5,0.5)">')
+            for stroke, segments in self.segments.items():
+                if not len(segments):
+                    continue
+                text = segments.astype(str)
+                d = " ".join(
+                    "M{} {}L{} {}".format(*row) for row in text.tolist())
+                f.write('<path d="{}" {} />'.format(d, attributes(
+                    stroke=stroke, stroke_width="1", fill="none",
+                    stroke_linecap="round")))
+            f.write("</g></svg>\n")
@@ -1,26 +1,48 @@
-from matplotlib import pyplot
+import numpy as np
 from shapely.geometry.polygon import Polygon
 from shapely.affinity import scale, rotate
-from chiplotle import (
-    hpgl,
-    instantiate_plotters
-    )
+
+PREVIEW_AXIS = [-11640, 10720, -11640, 10720]
+# `plot` keyword arguments and their `LineCollection` equivalents
+COLLECTION_STYLE = dict(
+    color='colors', linewidth='linewidths', solid_capstyle='capstyle')
 
 
 class Plotter:
+    """Previews polygons with matplotlib, and plots them too with `plot`.
+
+    With `batch`, polygons are only collected, one list per style, and
+    drawn as one `LineCollection` per style when the preview is saved.
+    The figure is then rendered with the Agg backend directly, without
+    pyplot, so it works on machines with no display.
+    """
 
-    def __init__(self, plot=False):
+    def __init__(self, plot=False, batch=False):
         self.plot = plot
+        self.batch = batch
         self.get_bounds()
-        self.fig = pyplot.figure(1, figsize=(5, 5), dpi=300)
-        pyplot.axis([-11640, 10720, -11640, 10720])
-        self.subplot = self.fig.add_subplot(111)
+        if batch:
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            self.fig = Figure(figsize=(5, 5), dpi=300)
+            FigureCanvasAgg(self.fig)
+            self.subplot = self.fig.add_subplot(111)
+        else:
+            from matplotlib import pyplot
+            self.fig = pyplot.figure(1, figsize=(5, 5), dpi=300)
+            self.subplot = self.fig.add_subplot(111)
+        # both modes frame the same fixed view of the bed
+        self.subplot.axis(PREVIEW_AXIS)
         self.subplot.set_title('PlotterPreview')
         self.default_style = dict(
             color='#000000', alpha=0.6,
             linewidth=0.7, solid_capstyle='round')
+        self.default_style_key = tuple(sorted(self.default_style.items()))
+        # style key -> exterior coordinates of every polygon in that style
+        self.batches = {}
         self.add_bounds_preview()
         if self.plot:
+            from chiplotle import instantiate_plotters
             plotters = instantiate_plotters()
             self.plotter = plotters[0]
 
@@ -40,12 +62,33 @@ class Plotter:
         self.preview_polygon(self.bounds_poly, color="#CCCCCC")
 
     def preview_polygon(self, poly, **kwargs):
+        if self.batch:
+            key = self.default_style_key
+            if kwargs:
+                key = tuple(sorted(dict(self.default_style, **kwargs).items()))
+            self.batches.setdefault(key, []).append(
+                np.asarray(poly.exterior.coords)[:, :2])
+            return
         x, y = poly.exterior.xy
         style = self.default_style.copy()
         style.update(kwargs)
         self.subplot.plot(x, y, **style)
 
+    def draw_batches(self):
+        """Adds one `LineCollection` per style holding every polygon
+        collected in that style, in the order the styles first appeared.
+        """
+        from matplotlib.collections import LineCollection
+        for key, lines in self.batches.items():
+            style = dict(
+                (COLLECTION_STYLE.get(name, name), value)
+                for name, value in key)
+            self.subplot.add_collection(
+                LineCollection(lines, **style), autolim=False)
+        self.batches = {}
+
     def plot_polygon(self, poly, **kwargs):
+        from chiplotle import hpgl
         coords = [coord for coord in poly.exterior.coords]
         start = hpgl.PU([coords[0]])
         command = hpgl.PD(coords[1:])
@@ -62,8 +105,13 @@ class Plotter:
         if self.plot:
             self.plot_polygon(poly, **kwargs)
 
-    def save_preview(self):
-        pyplot.savefig('plot.png', dpi=300)
+    def save_preview(self, filepath='plot.png'):
+        if self.batch:
+            self.draw_batches()
+            self.fig.savefig(filepath, dpi=300)
+            return
+        from matplotlib import pyplot
+        pyplot.savefig(filepath, dpi=300)
 
 
 def run():
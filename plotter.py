@@ -1,11 +1,21 @@
-import svgwrite
+import os
 import uuid
-from shapely.geometry import Polygon, Point, box
-from shapely.affinity import scale, translate
-from chiplotle import (
-    hpgl,
-    instantiate_plotters
-    )
+import numpy as np
+from shapely.geometry import Polygon, Point, LineString, box
+from shapely.affinity import scale, translate, affine_transform
+from store import PathStore, geom_coords
+import travel
+import dedupe
+import simplify
+import hpgl_compiler
+from svg_stream import SVGStreamWriter, rect_markup
+import raster
+from preview_buffer import PreviewBuffer, blank_page
+import clip
+from simulator import SimulatedPlotter
+from instrument import NULL
+from journal import PlotJournal, job_id
+from transform import Affine, PREVIEW_FLIP
 
 
 def position_and_size_of_geom(geom):
@@ -24,16 +34,65 @@ def px(*args):
 
 PLOTTER_UNITS_PER_INCH = 1018.39880656
 
+# preview stroke for each pen; pen None is whatever pen is loaded
+PEN_COLORS = {
+    None: "black",
+    1: "black",
+    2: "red",
+    3: "green",
+    4: "blue",
+    5: "orange",
+    6: "purple",
+    7: "brown",
+    8: "gray",
+    }
+
+
+def pen_order(pen):
+    """Sort key that plots the loaded pen (None) first, then pens by
+    number.
+    """
+    return (pen is not None, pen or 0)
+
+
+class PlotterSink:
+    """Binary file-like front for a chiplotle plotter, which takes text,
+    so compiled HPGL can be written to it like any other sink.
+    """
+
+    def __init__(self, plotter):
+        self.plotter = plotter
+
+    def write(self, data):
+        self.plotter.write(data.decode("latin-1"))
+
 
 class Drawing:
     """Assumes that everything is in inches
 
     Before plotting or making previews, all geometry is
-    translated into plotter units.
+    translated into plotter units and kept in a `PathStore`.
+
+    Geometry is kept in one layer per pen. Everything added goes to
+    the layer of `pen` unless a pen is given; pen None plots with
+    whatever pen is loaded and never sends `SP`. Layers are plotted one
+    after another by pen number, so each pen is selected once.
+
+    Pass an `instrument.Instrumentation` to time each stage and count
+    what goes through it.
     """
 
-    def __init__(self, default_scale=PLOTTER_UNITS_PER_INCH):
-        self.geoms = []
+    def __init__(self, default_scale=PLOTTER_UNITS_PER_INCH,
+                 instrument=NULL):
+        self.instrument = instrument
+        self.layers = {}
+        self.pen = None
+        self.pen_colors = dict(PEN_COLORS)
+        # open incremental preview and how many paths of each layer
+        # it already shows
+        self.preview_buffer = None
+        self.preview_options = None
+        self.rendered = {}
         self.get_bounds()
         self.default_preview_filepath = "previews/preview.svg"
         self.plotter = None
@@ -54,15 +113,430 @@ class Drawing:
         self.width = 11640 + 10720
         self.height = 8640 * 2
 
-    def plot(self):
-        if not self.plotter:
-            plotters = instantiate_plotters()
-            self.plotter = plotters[0]
-        for geom in self.geoms:
-            self.plot_geom(geom)
+    @property
+    def store(self):
+        """A read-only snapshot of every stored path in plot order, layer
+        by layer. With a single layer it shares that layer's buffers;
+        with several, the layers are copied into one store. Either way
+        it cannot be written and appending to it never reaches the
+        drawing: add paths with `add` or `add_lines`, or assign a store
+        to replace the whole drawing with it.
+        """
+        layers = self.plot_layers()
+        if len(layers) == 1:
+            return layers[0][1].read_only()
+        return PathStore.concatenate(
+            store for _, store in layers).read_only()
+
+    @store.setter
+    def store(self, store):
+        self.layers = {self.pen: store}
+        self.invalidate_preview()
+
+    def layer(self, pen=None):
+        """The store holding the paths of `pen` (the current pen by
+        default), created empty if needed.
+        """
+        pen = self.pen if pen is None else pen
+        if pen not in self.layers:
+            self.layers[pen] = PathStore()
+        return self.layers[pen]
+
+    def plot_layers(self):
+        """(pen, store) for every non-empty layer, in plot order."""
+        return [
+            (pen, self.layers[pen])
+            for pen in sorted(self.layers, key=pen_order)
+            if len(self.layers[pen])
+        ]
+
+    def map_layers(self, function):
+        """Replaces every layer's store with `function(store)`."""
+        for pen, store in list(self.layers.items()):
+            self.layers[pen] = function(store)
+        self.invalidate_preview()
+
+    def invalidate_preview(self):
+        """Marks every path as needing to be drawn again by the next
+        `refresh_preview`. Anything that rewrites stored paths, rather
+        than adding to them, calls this.
+        """
+        if self.preview_buffer:
+            self.preview_buffer.close()
+        self.preview_buffer = None
+        self.preview_options = None
+        self.rendered = {}
+
+    def plot(self, optimize=False, sink=None, encoding="absolute",
+             journal=None, compact=None):
+        """Sends the drawing to `sink` (a file path or binary file-like
+        object) if given, otherwise to the first chiplotle plotter.
+
+        `encoding` is one of `hpgl_compiler.ENCODINGS`. With a `journal`
+        file path, every path sent is recorded there so an interrupted
+        job can be picked up again with `resume`. With a `compact`
+        tolerance in plotter units, redundant vertices are dropped first
+        (see `compact`). What `optimize` and `compact` achieved is
+        counted on the instrument. Returns the bytes sent.
+        """
+        if optimize:
+            self.optimize_travel()
+        if compact is not None:
+            self.compact(compact)
+        if journal is not None:
+            plot_journal = PlotJournal(journal)
+            plot_journal.start(self.job_id(encoding))
+            return self.plot_journaled(plot_journal, 0, sink, encoding)
+        if sink is None:
+            if not self.plotter:
+                from chiplotle import instantiate_plotters
+                plotters = instantiate_plotters()
+                self.plotter = plotters[0]
+            # whole blocks, not a write per path
+            sink = PlotterSink(self.plotter)
+        return self.spool(sink, encoding=encoding)
+
+    def plot_async(self, device, encoding="absolute", baud=9600, **options):
+        """Plots on the serial device at path `device` with the asyncio
+        driver, which compiles HPGL while earlier output is still being
+        sent and never overruns the plotter's buffer. `options` go to
+        `async_driver.plot` (batch size, queue size, reply timeout).
+        Returns the number of bytes sent.
+        """
+        import asyncio
+        import async_driver
+        fd = async_driver.open_device(device, baud=baud)
+        try:
+            with self.instrument.stage("plot"):
+                size = asyncio.run(async_driver.plot(
+                    self.plot_layers(), fd, encoding=encoding, **options))
+                self.count_plotted(size)
+        finally:
+            os.close(fd)
+        return size
+
+    def resume(self, journal, sink=None, encoding="absolute"):
+        """Continues a job started with `plot(journal=...)`, skipping the
+        paths the journal says were already sent. The pen is lifted and
+        moved to the start of the first unfinished path before drawing
+        resumes. The drawing must hold the same paths, in the same order,
+        as when the job started.
+        """
+        plot_journal = PlotJournal(journal)
+        first = plot_journal.resume(self.job_id(encoding))
+        return self.plot_journaled(plot_journal, first, sink, encoding)
+
+    def job_id(self, encoding="absolute"):
+        return job_id(self.plot_layers(), encoding)
+
+    def layers_from(self, first):
+        """The plot layers trimmed to paths `first` onwards, counting
+        across all layers, and the pen position before path `first`.
+        """
+        remaining = []
+        origin = (0, 0)
+        for pen, store in self.plot_layers():
+            if first >= len(store):
+                first -= len(store)
+                if len(store):
+                    origin = hpgl_compiler.pen_position(store)
+                continue
+            if first:
+                origin = hpgl_compiler.pen_position(store.select([first - 1]))
+                store = store.select(np.arange(first, len(store)))
+                first = 0
+            remaining.append((pen, store))
+        return remaining, origin
+
+    def plot_journaled(self, plot_journal, first, sink, encoding):
+        """Plots paths `first` onwards one at a time, recording each one
+        in `plot_journal` once it has been written.
+        """
+        opened = isinstance(sink, str)
+        if sink is None:
+            if not self.plotter:
+                from chiplotle import instantiate_plotters
+                plotters = instantiate_plotters()
+                self.plotter = plotters[0]
+            write = PlotterSink(self.plotter).write
+        else:
+            if opened:
+                sink = open(sink, "ab" if first else "wb")
+            write = sink.write
+        remaining, origin = self.layers_from(first)
+        size = 0
+        try:
+            with self.instrument.stage("plot"):
+                # always start with the pen up, wherever it was left
+                for chunk in (
+                        b"PU;", hpgl_compiler.prologue(encoding, origin)):
+                    if chunk:
+                        write(chunk)
+                        size += len(chunk)
+                for index, chunk in enumerate(
+                        hpgl_compiler.iter_layers(
+                            remaining, encoding=encoding, origin=origin),
+                        first):
+                    write(chunk)
+                    plot_journal.record(index)
+                    size += len(chunk)
+                epilogue = hpgl_compiler.epilogue(encoding, remaining)
+                if epilogue:
+                    write(epilogue)
+                    size += len(epilogue)
+                self.count_plotted(size, remaining)
+        finally:
+            plot_journal.close()
+            if opened:
+                sink.close()
+            elif hasattr(sink, "flush"):
+                sink.flush()
+        return size
+
+    def count_plotted(self, size, layers=None):
+        """Counts a plotted store or list of layers (all of the drawing
+        by default).
+        """
+        layers = hpgl_compiler.as_layers(
+            self.plot_layers() if layers is None else layers)
+        self.instrument.count(
+            "pen_up_moves", sum(len(store) for _, store in layers))
+        self.instrument.count(
+            "pen_changes", sum(pen is not None for pen, _ in layers))
+        self.instrument.count("hpgl_bytes", size)
+
+    def compile_hpgl(self, encoding="absolute"):
+        """Returns the whole drawing as one HPGL byte string."""
+        return hpgl_compiler.compile_paths(
+            self.plot_layers(), encoding=encoding)
+
+    def spool(self, sink, block_size=hpgl_compiler.BLOCK_SIZE,
+              encoding="absolute"):
+        """Writes the compiled drawing to a file path or binary
+        file-like object in large blocks. Returns the bytes written.
+        """
+        with self.instrument.stage("plot"):
+            size = hpgl_compiler.spool(
+                self.plot_layers(), sink, block_size=block_size,
+                encoding=encoding)
+            self.count_plotted(size)
+        return size
+
+    def stream(self, chunks, svg_path=None, hpgl_sink=None,
+               encoding="absolute", clip_paths=True, pack=False,
+               compact=None, thumbnail_path=None):
+        """Pushes batches of equal-length lines, given as (n, k, 2) arrays
+        in scalar units, straight through scaling, optional clipping and
+        optional compaction to within `compact` plotter units into an
+        SVG preview, a level-of-detail thumbnail (see
+        `preview_thumbnail`) and/or an HPGL sink, without keeping them in
+        the drawing. Memory use depends on the batch size only.
+
+        Returns the number of paths written.
+        """
+        writer = self.open_preview(svg_path, pack=pack) if svg_path else None
+        thumbnail = None
+        if thumbnail_path:
+            import lod
+            paper, viewbox, screen_size = self.preview_frame()
+            thumbnail = lod.Thumbnail(viewbox, *screen_size)
+        sink = hpgl_sink
+        if isinstance(hpgl_sink, str):
+            sink = open(hpgl_sink, "wb")
+        position = (0, 0)
+        written = 0
+        try:
+            if sink is not None:
+                sink.write(hpgl_compiler.prologue(encoding))
+            for lines in chunks:
+                with self.instrument.stage("scale"):
+                    lines = np.asarray(lines, dtype=np.float64)
+                    batch = PathStore(capacity=len(lines) * lines.shape[1])
+                    batch.extend(self.to_plotter.apply(lines))
+                if clip_paths:
+                    with self.instrument.stage("clip"):
+                        batch = clip.clip(batch, self.bounds)
+                if compact is not None:
+                    with self.instrument.stage("compact"):
+                        vertices = batch.vertex_count
+                        batch = simplify.compact(batch, compact)
+                        self.instrument.count(
+                            "vertices_removed", vertices - batch.vertex_count)
+                if not len(batch):
+                    continue
+                if writer:
+                    with self.instrument.stage("preview"):
+                        writer.write_store(batch)
+                if thumbnail:
+                    with self.instrument.stage("preview_thumbnail"):
+                        thumbnail.add_store(batch)
+                if sink is not None:
+                    with self.instrument.stage("plot"):
+                        size = hpgl_compiler.write_blocks(
+                            hpgl_compiler.iter_compiled_paths(
+                                batch, encoding=encoding, origin=position),
+                            sink)
+                        position = hpgl_compiler.pen_position(batch)
+                        self.count_plotted(size, batch)
+                self.instrument.count("geometries", len(batch))
+                self.instrument.count("vertices", batch.vertex_count)
+                written += len(batch)
+            if sink is not None:
+                sink.write(hpgl_compiler.epilogue(encoding))
+            if thumbnail:
+                thumbnail.write_svg(thumbnail_path, paper)
+        finally:
+            if writer:
+                writer.close()
+            if sink is not None and sink is not hpgl_sink:
+                sink.close()
+        return written
+
+    def tile(self, directory, tile_width=None, tile_height=None,
+             encoding="absolute", preview=True, marks=True, mark_pen=None,
+             processes=None):
+        """Splits a drawing larger than one sheet into sheet-sized tiles
+        and writes the HPGL, and with `preview` an SVG preview, of every
+        tile to `directory` on a process pool, along with `tiles.json`
+        saying where each sheet goes.
+
+        Tiles default to the plotter bed less room for the registration
+        marks, and are all plotted from the same corner of the bed.
+        Returns a dict of tile name -> number of paths.
+        """
+        import tiles
+        margin = tiles.MARK_GAP + tiles.MARK_LENGTH if marks else 0
+        tile_width = tile_width or self.width - 2 * margin
+        tile_height = tile_height or self.height - 2 * margin
+        sheet_origin = (self.bounds[0] + margin, self.bounds[1] + margin)
+        with self.instrument.stage("tile"):
+            tiling = tiles.Tiling(
+                self.plot_layers(), tile_width, tile_height, sheet_origin,
+                marks=marks, mark_pen=mark_pen)
+            written = tiles.write_tiles(
+                tiling, directory, encoding=encoding, preview=preview,
+                processes=processes)
+        self.instrument.count("tiles", len(written))
+        return written
+
+    def estimate(self, encoding="absolute", **model):
+        """Runs the compiled drawing through a `SimulatedPlotter` built
+        with `model` and returns its time and distance estimate.
+        """
+        simulated = SimulatedPlotter(**model)
+        self.spool(simulated, encoding=encoding)
+        return simulated.estimate()
+
+    def encoding_report(self, encoding="absolute"):
+        """Bytes and bytes per vertex of the drawing in an encoding."""
+        return hpgl_compiler.encoding_report(
+            self.plot_layers(), encoding=encoding)
+
+    @property
+    def geoms(self):
+        """Shapely view of the stored paths, in plotter units."""
+        return [
+            LineString(coords) if len(coords) > 1 else Point(coords[0])
+            for _, store in self.plot_layers()
+            for coords in store
+        ]
+
+    def add(self, geom, pen=None):
+        """Adds a shapely geometry, or an (n, 2) array of coordinates,
+        in scalar units, to the layer of `pen`.
+        """
+        store = self.layer(pen)
+        with self.instrument.stage("scale"):
+            if isinstance(geom, np.ndarray):
+                parts = [geom]
+            else:
+                parts = list(geom_coords(geom))
+            for coords in parts:
+                store.append(self.to_plotter.apply(coords))
+                self.instrument.count("vertices", len(coords))
+            self.instrument.count("geometries", len(parts))
+
+    def add_lines(self, lines, pen=None):
+        """Adds many equal-length paths at once from an (n, k, 2) array
+        in scalar units, to the layer of `pen`.
+        """
+        store = self.layer(pen)
+        with self.instrument.stage("scale"):
+            lines = np.asarray(lines, dtype=np.float64)
+            store.extend(self.to_plotter.apply(lines))
+            self.instrument.count("geometries", lines.shape[0])
+            self.instrument.count("vertices", lines.shape[0] * lines.shape[1])
+
+    def dedupe(self, tolerance=1.0, merge_collinear=False):
+        """Drops stored paths that repeat another path in the same layer,
+        forwards or backwards, once their vertices are rounded to a
+        `tolerance` grid in plotter units (see
+        `dedupe.unique_path_indices`). With
+        `merge_collinear`, overlapping segments on the same line are also
+        merged into one.
 
-    def add(self, geom):
-        self.geoms.append(self.scale_to_plotter_units(geom))
+        Returns the number of paths removed.
+        """
+        count = self.path_count()
+        with self.instrument.stage("dedupe"):
+            self.map_layers(lambda store: dedupe.dedupe(
+                store, tolerance=tolerance, merge=merge_collinear))
+        removed = count - self.path_count()
+        self.instrument.count("duplicates_removed", removed)
+        return removed
+
+    def path_count(self):
+        return sum(len(store) for store in self.layers.values())
+
+    def compact(self, tolerance=simplify.DEFAULT_TOLERANCE, encoding=None):
+        """Drops collinear vertices and simplifies every path to within
+        `tolerance` plotter units (Douglas-Peucker). The default half a
+        unit is below what HPGL's whole-unit coordinates can show.
+
+        Returns the vertex count before and after. Given an `encoding`,
+        the drawing is also compiled before and after to report the
+        bytes saved.
+        """
+        report = dict(tolerance=tolerance,
+                      vertices_before=self.vertex_count())
+        if encoding:
+            report["bytes_before"] = self.encoding_report(encoding)["bytes"]
+        with self.instrument.stage("compact"):
+            self.map_layers(
+                lambda store: simplify.compact(store, tolerance))
+        report["vertices_after"] = self.vertex_count()
+        if encoding:
+            report["bytes_after"] = self.encoding_report(encoding)["bytes"]
+        self.instrument.count(
+            "vertices_removed",
+            report["vertices_before"] - report["vertices_after"])
+        return report
+
+    def vertex_count(self):
+        return sum(store.vertex_count for store in self.layers.values())
+
+    def optimize_travel(self, refine=False, **two_opt_options):
+        """Reorders and flips the paths of each layer to minimize pen-up
+        travel, optionally refining the greedy order with 2-opt moves.
+        Each layer starts from where the previous one left the pen.
+
+        Returns the pen-up travel distance before and after, in plotter
+        units.
+        """
+        before = after = 0.0
+        start = (0.0, 0.0)
+        with self.instrument.stage("optimize_travel"):
+            for pen, store in self.plot_layers():
+                optimized, layer_before, layer_after = travel.optimize(
+                    store, start=start, refine=refine, **two_opt_options)
+                self.layers[pen] = optimized
+                before += layer_before
+                after += layer_after
+                start = optimized.coords[-1]
+        self.invalidate_preview()
+        self.instrument.count("pen_up_travel_before", before)
+        self.instrument.count("pen_up_travel_after", after)
+        return before, after
 
     def add_paper(self, width, height):
         """paper width and height are assumed to be in scalar units
@@ -81,15 +555,20 @@ class Drawing:
         return self.paper
 
     def scale_to_plotter_units(self, geom):
-        return scale(geom, self.scalar, self.scalar, origin=Point(0, 0))
+        return affine_transform(geom, self.to_plotter.shapely_params())
+
+    @property
+    def to_plotter(self):
+        """Transform from scalar units (inches by default) to plotter
+        units.
+        """
+        return Affine.scale(self.scalar)
 
     def clip_to_plotter_bounds(self):
         """Clips all geometries to the boundaries of the plotter
         """
-        self.geoms = [
-            self.bounds_poly.intersection(geom)
-            for geom in self.geoms
-        ]
+        with self.instrument.stage("clip"):
+            self.map_layers(lambda store: clip.clip(store, self.bounds))
 
     def plot_geom(self, geom):
         if hasattr(geom, 'coords'):
@@ -108,29 +587,38 @@ class Drawing:
             raise NotImplementedError(
                 "I don't know how to plot {}".format(type(geom)))
 
-    def start_svg(self):
-        preview_margin = 100
-        screen_height = 600
+    def preview_frame(self, preview_margin=100, screen_height=600):
+        """Returns the paper rectangle (x, y, width, height) in plotter
+        units, the preview viewbox and its on-screen width and height.
+        """
         plotter_paper = self.scale_to_plotter_units(self.paper)
-        paper_x, paper_y, paper_width, paper_height = \
-            position_and_size_of_geom(plotter_paper)
+        paper = position_and_size_of_geom(plotter_paper)
+        paper_x, paper_y, paper_width, paper_height = paper
         paper_top = paper_y + paper_height
         svg_width = paper_width + (preview_margin * 2)
         svg_height = paper_height + (preview_margin * 2)
         screen_width = (svg_width / float(svg_height)) * screen_height
+        viewbox = (
+            paper_x - preview_margin,
+            (paper_top * -1) - preview_margin,
+            svg_width,
+            svg_height,
+            )
+        return paper, viewbox, (screen_width, screen_height)
+
+    def start_svg(self):
+        paper, viewbox, screen_size = self.preview_frame()
+        paper_x, paper_y, paper_width, paper_height = paper
+        import svgwrite
         self.svg = svgwrite.Drawing(
             filename=self.default_preview_filepath,
-            size=px(screen_width, screen_height),
+            size=px(*screen_size),
             style="background-color: #ccc"
             )
-        self.svg.viewbox(
-            minx=paper_x - preview_margin,
-            miny=(paper_top * -1) - preview_margin,
-            width=svg_width,
-            height=svg_height,
-            )
+        minx, miny, width, height = viewbox
+        self.svg.viewbox(minx=minx, miny=miny, width=width, height=height)
         self.plotter_geom_group = self.svg.g(
-            transform="scale(1, -1)"
+            transform=PREVIEW_FLIP.svg()
             )
         # draw paper
         self.plotter_geom_group.add(self.svg.rect(
@@ -139,26 +627,129 @@ class Drawing:
             fill="white",
             ))
 
-    def preview(self, filepath=None):
-        self.start_svg()
-        for geom in self.geoms:
-            self.preview_geom(geom)
-        self.svg.add(self.plotter_geom_group)
-        self.add_bounds_preview()
-        if not filepath:
-            self.svg.save()
-        else:
-            self.svg.saveas(filepath)
+    def preview(self, filepath=None, pack=False, chunk_size=1000):
+        """Streams an SVG preview to disk `chunk_size` paths at a time.
+        With `pack`, each chunk becomes a single `<path>` element. Each
+        layer is stroked in its pen's color from `pen_colors`.
+        """
+        with self.instrument.stage("preview"):
+            with self.open_preview(filepath, pack=pack,
+                                   chunk_size=chunk_size) as writer:
+                for pen, store in self.plot_layers():
+                    writer.write_store(
+                        store, stroke=self.pen_colors.get(pen, "black"))
+
+    def preview_png(self, filepath=None, screen_height=600, density=False):
+        """Renders the stored paths straight into a PNG image
+        `screen_height` pixels high. With `density`, pixels are shaded by
+        how many lines cross them.
+        """
+        paper, viewbox, screen_size = self.preview_frame(
+            screen_height=screen_height)
+        filepath = filepath or \
+            self.default_preview_filepath.replace(".svg", ".png")
+        with self.instrument.stage("preview_png"):
+            canvas = raster.Raster(viewbox, *screen_size)
+            for _, store in self.plot_layers():
+                canvas.add_store(store)
+            raster.write_png(filepath, canvas.image(
+                density=density, base=blank_page(canvas, paper)))
+        return filepath
+
+    def preview_thumbnail(self, filepath=None, screen_height=600):
+        """Writes a level-of-detail SVG preview `screen_height` pixels
+        high (see `lod.Thumbnail`). Sub-pixel detail is merged away and
+        segments that ink no new pixel are dropped, so the file size
+        depends on the screen size, not on how many lines the drawing
+        has. Returns the number of segments written.
+        """
+        import lod
+        paper, viewbox, screen_size = self.preview_frame(
+            screen_height=screen_height)
+        filepath = filepath or \
+            self.default_preview_filepath.replace(".svg", "-thumbnail.svg")
+        with self.instrument.stage("preview_thumbnail"):
+            thumbnail = lod.Thumbnail(viewbox, *screen_size)
+            for pen, store in self.plot_layers():
+                thumbnail.add_store(
+                    store, stroke=self.pen_colors.get(pen, "black"))
+            thumbnail.write_svg(filepath, paper)
+        self.instrument.count("thumbnail_segments", thumbnail.segment_count())
+        return thumbnail.segment_count()
+
+    def refresh_preview(self, filepath=None, png_path=None,
+                        screen_height=600, density=False):
+        """Keeps a preview open across calls and adds only the paths
+        stored since the last refresh, so a refresh costs as much as the
+        change rather than the whole drawing. The SVG goes to `filepath`
+        (the default preview path if neither file is given) and a PNG to
+        `png_path`.
+
+        After anything rewrote stored paths -- dedupe, travel
+        optimization, clipping, compaction -- or the files or options
+        changed, the preview starts over. Returns the number of paths
+        drawn.
+        """
+        if filepath is None and png_path is None:
+            filepath = self.default_preview_filepath
+        options = (filepath, png_path, screen_height, density)
+        if self.preview_buffer and self.preview_options != options:
+            self.invalidate_preview()
+        if not self.preview_buffer:
+            self.preview_buffer = self.open_preview_buffer(*options)
+            self.preview_options = options
+        drawn = 0
+        with self.instrument.stage("preview"):
+            for pen, store in self.plot_layers():
+                done = self.rendered.get(pen, 0)
+                if done == len(store):
+                    continue
+                self.preview_buffer.add(
+                    store.select(np.arange(done, len(store))),
+                    stroke=self.pen_colors.get(pen, "black"))
+                drawn += len(store) - done
+                self.rendered[pen] = len(store)
+            self.preview_buffer.flush()
+        self.instrument.count("preview_paths", drawn)
+        return drawn
+
+    def open_preview_buffer(self, filepath, png_path, screen_height,
+                            density):
+        buffer = PreviewBuffer(png_path=png_path, density=density)
+        if filepath:
+            buffer.writer = self.open_preview(filepath, pack=True)
+        if png_path:
+            paper, viewbox, screen_size = self.preview_frame(
+                screen_height=screen_height)
+            buffer.canvas = raster.Raster(viewbox, *screen_size)
+            buffer.base = blank_page(buffer.canvas, paper)
+        return buffer
+
+    def open_preview(self, filepath=None, **kwargs):
+        """Returns an `SVGStreamWriter` with the paper already drawn and
+        the y-flipped plotter group open. Closing it adds the bounds.
+        """
+        paper, viewbox, screen_size = self.preview_frame()
+        writer = SVGStreamWriter(
+            filepath or self.default_preview_filepath,
+            width=px(screen_size[0])[0],
+            height=px(screen_size[1])[0],
+            viewbox=viewbox,
+            style="background-color: #ccc",
+            **kwargs)
+        writer.start_group(transform=PREVIEW_FLIP.svg())
+        paper_x, paper_y, paper_width, paper_height = paper
+        writer.rect(paper_x, paper_y, paper_width, paper_height, fill="white")
+        writer.trailer.append(rect_markup(
+            self.bounds[0], self.bounds[1], self.width, self.height,
+            stroke_width=25, stroke_dasharray=100,
+            stroke="black", fill="none"))
+        return writer
 
     def preview_geom(self, geom, **kwargs):
         if hasattr(geom, 'xy'):
             # assume it is a linear ring or linestring
-            self.plotter_geom_group.add(self.svg.polyline(
-                points=geom.coords,
-                stroke_width="1",
-                fill="none",
-                stroke="black",)
-            )
+            self.preview_coords(geom.coords, **kwargs)
         elif hasattr(geom, 'exterior'):
             # assume it has a Polygon-like interface
             self.preview_geom(geom.exterior, **kwargs)
@@ -172,6 +763,12 @@ class Drawing:
             raise NotImplementedError(
                 "I don't know how to preview {}".format(type(geom)))
 
+    def preview_coords(self, coords, **kwargs):
+        style = dict(stroke_width="1", fill="none", stroke="black")
+        style.update(kwargs)
+        self.plotter_geom_group.add(self.svg.polyline(
+            points=[tuple(coord) for coord in coords], **style))
+
     def add_bounds_preview(self):
         self.svg.add(self.svg.rect(
             insert=(self.bounds[0], self.bounds[1]),
@@ -183,6 +780,7 @@ class Drawing:
             ))
 
     def plot_coords(self, coords):
+        from chiplotle import hpgl
         start = hpgl.PU([coords[0]])
         self.plotter.write(start)
         threshold = 300
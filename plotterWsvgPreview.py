@@ -1,11 +1,7 @@
-import svgwrite
-from matplotlib import pyplot
+import numpy as np
 from shapely.geometry import Polygon, LineString
 from shapely.affinity import scale, rotate
-from chiplotle import (
-    hpgl,
-    instantiate_plotters
-    )
+from transform import Affine, PREVIEW_FLIP
 
 
 class Drawing:
@@ -14,6 +10,7 @@ class Drawing:
         self.geoms = geoms or []
         self.scale_ratio = 1
         self.get_bounds()
+        import svgwrite
         self.svg = svgwrite.Drawing(
             filename="preview.svg",
             size=("2560px", "1600px")
@@ -29,6 +26,7 @@ class Drawing:
 
     def plot(self, geom=None):
         if not self.plotter:
+            from chiplotle import instantiate_plotters
             plotters = instantiate_plotters()
             self.plotter = plotters[0]
         if geom:
@@ -61,18 +59,13 @@ class Drawing:
             self.add(geom)
         for geom in self.geoms:
             self.preview_geom(geom)
-        print(self.svg.tostring())
         self.svg.save()
 
     def preview_geom(self, geom, **kwargs):
         if hasattr(geom, 'xy'):
             # assume it is a linear ring or linestring
-            line_points = geom.coords
-            x_offset = self.width/2
-            y_offset = self.height/2
-            line_points = [
-                (x[0]+x_offset, x[1]*-1 + y_offset)
-                for x in line_points]
+            line_points = self.to_preview.apply(
+                np.asarray(geom.coords)).tolist()
             self.svg.add(self.svg.polyline(
                 points=line_points,
                 stroke_width="5",
@@ -116,6 +109,7 @@ class Drawing:
             ))
 
     def plot_coords(self, coords):
+        from chiplotle import hpgl
         start = hpgl.PU([coords[0]])
         self.plotter.write(start)
         threshold = 300
@@ -128,6 +122,12 @@ class Drawing:
         end = hpgl.PU([coords[-1]])
         self.plotter.write(end)
 
+    @property
+    def to_preview(self):
+        """Plotter units to the y-down SVG space, origin at the center."""
+        return PREVIEW_FLIP.then(
+            Affine.translate(self.width / 2, self.height / 2))
+
     def scale_to_fit(self, geom):
         return scale(
             geom,
@@ -1,11 +1,7 @@
-import svgwrite
-from matplotlib import pyplot
+import numpy as np
 from shapely.geometry import Polygon, LineString
 from shapely.affinity import scale, rotate
-from chiplotle import (
-    hpgl,
-    instantiate_plotters
-    )
+from transform import Affine
 
 
 class Drawing:
@@ -17,6 +13,7 @@ class Drawing:
         self.width = 10000
         self.height = 8000
         self.set_multipliers_from_bounds()
+        import svgwrite
         self.svg = svgwrite.Drawing(
             filename="preview.svg",
             size=("2560px", "1600px")
@@ -32,6 +29,7 @@ class Drawing:
 
     def plot(self, geom=None):
         if not self.plotter:
+            from chiplotle import instantiate_plotters
             plotters = instantiate_plotters()
             self.plotter = plotters[0]
         if geom:
@@ -45,11 +43,8 @@ class Drawing:
     def plot_geom(self, geom):
         if hasattr(geom, 'coords'):
             # assume it is a linear ring or linestring
-            coords = [
-                (p[0]*self.x_mult_to_plot - self.plotter_x_offset,
-                 p[1]*self.y_mult_to_plot - self.plotter_y_offset)
-                for p in line_points]
-            self.plot_coords([coord for coord in geom.coords])
+            coords = self.to_plot.apply(np.asarray(geom.coords))
+            self.plot_coords(coords.tolist())
         elif hasattr(geom, 'exterior'):
             # assume it has a Polygon-like interface
             self.plot_geom(geom.exterior)
@@ -68,18 +63,13 @@ class Drawing:
             self.add(geom)
         for geom in self.geoms:
             self.preview_geom(geom)
-        print(self.svg.tostring())
         self.svg.save()
 
     def preview_geom(self, geom, **kwargs):
         if hasattr(geom, 'xy'):
             # assume it is a linear ring or linestring
-            line_points = geom.coords
-
-            line_points = [
-                (p[0]*self.x_mult_to_preview,
-                 1600 - p[1]*self.y_mult_to_preview)
-                for p in line_points]
+            line_points = self.to_preview.apply(
+                np.asarray(geom.coords)).tolist()
             self.svg.add(self.svg.polyline(
                 points=line_points,
                 stroke_width="1",
@@ -116,6 +106,14 @@ class Drawing:
         self.y_mult_to_preview = 1600/8000.0 
         self.x_mult_to_plot = self.plotter_width/10000.0
         self.y_mult_to_plot = self.plotter_height/8000.0
+        # master coordinates -> plotter units, lower-left origin
+        self.to_plot = Affine.scale(
+            self.x_mult_to_plot, self.y_mult_to_plot).then(
+            Affine.translate(-self.plotter_x_offset, -self.plotter_y_offset))
+        # master coordinates -> 2560x1600 preview, upper-left origin
+        self.to_preview = Affine.scale(
+            self.x_mult_to_preview, -self.y_mult_to_preview).then(
+            Affine.translate(0, 1600))
 
     def add_bounds_preview(self):
         
@@ -128,6 +126,7 @@ class Drawing:
             ))
 
     def plot_coords(self, coords):
+        from chiplotle import hpgl
         start = hpgl.PU([coords[0]])
         self.plotter.write(start)
         threshold = 300
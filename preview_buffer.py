@@ -0,0 +1,46 @@
+import numpy as np
+import raster
+
+
+class PreviewBuffer:
+    """A preview that stays open between refreshes so new paths can be
+    added to it without redrawing the old ones.
+
+    The SVG keeps its file open; each `flush` leaves a complete document
+    on disk and the next paths are written over its closing markup. The
+    PNG keeps its `raster.Raster` counts and only re-encodes the image,
+    whose size depends on the screen, not the drawing.
+    """
+
+    def __init__(self, writer=None, canvas=None, base=None, png_path=None,
+                 density=False):
+        self.writer = writer
+        self.canvas = canvas
+        self.base = base
+        self.png_path = png_path
+        self.density = density
+
+    def add(self, store, stroke="black"):
+        if self.writer:
+            self.writer.write_store(store, stroke=stroke)
+        if self.canvas:
+            self.canvas.add_store(store)
+
+    def flush(self):
+        if self.writer:
+            self.writer.snapshot()
+        if self.canvas:
+            raster.write_png(self.png_path, self.canvas.image(
+                density=self.density, base=self.base))
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+
+
+def blank_page(canvas, paper):
+    """The background and paper of a raster preview, before any lines."""
+    base = np.full((canvas.height, canvas.width), raster.BACKGROUND,
+                   dtype=np.uint8)
+    canvas.fill_rect(base, *paper, value=raster.PAPER)
+    return base
@@ -0,0 +1,137 @@
+import struct
+import zlib
+import numpy as np
+from transform import Affine, PREVIEW_FLIP
+
+BACKGROUND = 0xcc
+PAPER = 0xff
+INK = 0x00
+SAMPLES_PER_CHUNK = 1 << 22
+
+
+class Raster:
+    """Maps a viewbox in y-flipped preview space (the same one the SVG
+    preview uses) onto a `width` x `height` pixel grid and accumulates
+    how many line samples land in each pixel.
+    """
+
+    def __init__(self, viewbox, width, height):
+        self.minx, self.miny, self.view_width, self.view_height = viewbox
+        self.width = int(round(width))
+        self.height = int(round(height))
+        self.counts = np.zeros(self.width * self.height, dtype=np.uint32)
+        self.transform = PREVIEW_FLIP.then(
+            Affine.translate(-self.minx, -self.miny)).then(
+            Affine.scale(self.width / self.view_width,
+                         self.height / self.view_height))
+
+    def to_pixels(self, coords):
+        """Converts plotter-unit coordinates to fractional pixel
+        coordinates, flipping y so that up is up.
+        """
+        return self.transform.apply(coords)
+
+    def add_store(self, store):
+        """Rasterizes every segment of every path in a `PathStore`."""
+        offsets = store.offsets
+        pixels = self.to_pixels(store.coords)
+        # a segment starts at every vertex that is not the last of its path
+        is_start = np.ones(len(pixels), dtype=bool)
+        is_start[offsets[1:] - 1] = False
+        starts = np.nonzero(is_start)[0]
+        self.add_segments(pixels[starts], pixels[starts + 1])
+        # paths made of a single vertex still leave a dot
+        single = offsets[:-1][np.diff(offsets) == 1]
+        self.add_samples(pixels[single])
+
+    def add_segments(self, starts, ends):
+        """Rasterizes segments given in pixel coordinates, sampling each
+        one at least once per pixel along its longer axis.
+        """
+        for _, samples in iter_segment_samples(starts, ends):
+            self.add_samples(samples)
+
+    def pixel_index(self, pixels):
+        """Flat index of the pixel under each point, -1 off the image."""
+        columns = np.floor(pixels[:, 0]).astype(np.int64)
+        rows = np.floor(pixels[:, 1]).astype(np.int64)
+        inside = (columns >= 0) & (columns < self.width) & \
+            (rows >= 0) & (rows < self.height)
+        return np.where(inside, rows * self.width + columns, -1)
+
+    def add_samples(self, pixels):
+        flat = self.pixel_index(pixels)
+        self.counts += np.bincount(
+            flat[flat >= 0], minlength=len(self.counts)).astype(np.uint32)
+
+    def fill_rect(self, image, x, y, width, height, value):
+        """Fills a rectangle given in plotter units on an image."""
+        corners = self.to_pixels([(x, y), (x + width, y + height)])
+        left, right = sorted(corners[:, 0])
+        top, bottom = sorted(corners[:, 1])
+        image[max(int(top), 0):max(int(np.ceil(bottom)), 0),
+              max(int(left), 0):max(int(np.ceil(right)), 0)] = value
+
+    def image(self, density=False, base=None):
+        """Returns the raster as a uint8 grayscale image.
+
+        By default any pixel a line touches is drawn in solid ink. With
+        `density`, pixels are shaded by how many samples hit them, on a
+        log scale, which shows where lines pile up.
+        """
+        if base is None:
+            base = np.full((self.height, self.width), PAPER, dtype=np.uint8)
+        counts = self.counts.reshape(self.height, self.width)
+        image = base.copy()
+        if density:
+            weight = np.log1p(counts.astype(np.float64))
+            if weight.max() > 0:
+                weight /= weight.max()
+            ink = image * (1 - weight) + INK * weight
+            return np.round(ink).astype(np.uint8)
+        image[counts > 0] = INK
+        return image
+
+
+def iter_segment_samples(starts, ends):
+    """Samples segments given in pixel coordinates at least once per
+    pixel along their longer axis. Yields, in batches of a bounded number
+    of samples, the index of the segment each sample belongs to and the
+    samples themselves, in segment order.
+    """
+    deltas = ends - starts
+    steps = np.ceil(np.abs(deltas).max(axis=1)).astype(np.int64) + 1
+    first = 0
+    while first < len(steps):
+        # keep the number of samples per batch bounded
+        totals = np.cumsum(steps[first:])
+        last = first + max(1, int(np.searchsorted(
+            totals, SAMPLES_PER_CHUNK, side='right')))
+        chunk_steps = steps[first:last]
+        owner = np.repeat(np.arange(first, last), chunk_steps)
+        chunk_offsets = np.cumsum(chunk_steps) - chunk_steps
+        index = np.arange(len(owner)) - np.repeat(
+            chunk_offsets, chunk_steps)
+        t = index / np.maximum(steps[owner] - 1, 1)
+        yield owner, starts[owner] + deltas[owner] * t[:, None]
+        first = last
+
+
+def write_png(filepath, image):
+    """Writes a 2D uint8 array as an 8-bit grayscale PNG."""
+    image = np.ascontiguousarray(image, dtype=np.uint8)
+    height, width = image.shape
+    # every scanline starts with filter type 0 (none)
+    rows = np.zeros((height, width + 1), dtype=np.uint8)
+    rows[:, 1:] = image
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + \
+            struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+
+    with open(filepath, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(
+            ">IIBBBBB", width, height, 8, 0, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(rows.tobytes(), 6)))
+        f.write(chunk(b"IEND", b""))
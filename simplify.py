@@ -0,0 +1,98 @@
+import numpy as np
+from store import PathStore
+
+DEFAULT_TOLERANCE = 0.5
+COLLINEAR_EPSILON = 1e-6
+
+
+def segment_distance(points, starts, ends):
+    """Distance from each point to the segment between the matching
+    `starts` and `ends`, all (n, 2) arrays.
+    """
+    direction = ends - starts
+    length = (direction ** 2).sum(axis=1)
+    t = ((points - starts) * direction).sum(axis=1) / np.where(
+        length > 0, length, 1.0)
+    nearest = starts + direction * np.clip(t, 0.0, 1.0)[:, None]
+    return np.hypot(*(points - nearest).T)
+
+
+def path_end_mask(store):
+    """Boolean mask of the vertices that start or end a path."""
+    ends = np.zeros(store.vertex_count, dtype=bool)
+    if len(store):
+        ends[store.offsets[:-1]] = True
+        ends[store.offsets[1:] - 1] = True
+    return ends
+
+
+def keep_vertices(store, keep):
+    """Returns a new store with only the vertices marked in `keep`."""
+    if not len(store):
+        return PathStore()
+    counts = np.add.reduceat(keep.astype(np.int64), store.offsets[:-1])
+    offsets = np.zeros(len(store) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return PathStore.from_arrays(store.coords[keep], offsets)
+
+
+def drop_collinear(store, epsilon=COLLINEAR_EPSILON):
+    """Drops every inner vertex that lies on the segment between its
+    neighbours, within `epsilon` plotter units, in one pass over the
+    whole store. A vertex where the path doubles back is off that
+    segment, so it is kept.
+    """
+    coords = store.coords
+    keep = path_end_mask(store)
+    inner = np.nonzero(~keep)[0]
+    distance = segment_distance(
+        coords[inner], coords[inner - 1], coords[inner + 1])
+    keep[inner[distance > epsilon]] = True
+    return keep_vertices(store, keep)
+
+
+def douglas_peucker(store, tolerance=DEFAULT_TOLERANCE):
+    """Douglas-Peucker simplification of every path in a store.
+
+    Rather than recursing path by path, each round handles every open
+    span of every path at once: it finds the inner vertex farthest from
+    the span's chord and, if that is more than `tolerance` away, keeps
+    it and splits the span there. No dropped vertex ends up more than
+    `tolerance` from the simplified path.
+    """
+    coords = store.coords
+    keep = path_end_mask(store)
+    if not len(store):
+        return keep_vertices(store, keep)
+    starts = store.offsets[:-1]
+    ends = store.offsets[1:] - 1
+    while True:
+        open_spans = ends - starts > 1
+        starts, ends = starts[open_spans], ends[open_spans]
+        if not len(starts):
+            break
+        counts = ends - starts - 1
+        firsts = np.cumsum(counts) - counts
+        span = np.repeat(np.arange(len(starts)), counts)
+        inner = np.arange(counts.sum()) - np.repeat(firsts, counts) + \
+            starts[span] + 1
+        distance = segment_distance(
+            coords[inner], coords[starts[span]], coords[ends[span]])
+        worst = np.maximum.reduceat(distance, firsts)
+        # first vertex of each span at its maximum distance
+        farthest = distance == worst[span]
+        _, first_farthest = np.unique(span[farthest], return_index=True)
+        split = inner[farthest][first_farthest]
+        far = worst > tolerance
+        keep[split[far]] = True
+        starts, ends = (
+            np.concatenate([starts[far], split[far]]),
+            np.concatenate([split[far], ends[far]]))
+    return keep_vertices(store, keep)
+
+
+def compact(store, tolerance=DEFAULT_TOLERANCE):
+    """Removes collinear vertices, then simplifies what is left to
+    within `tolerance` plotter units.
+    """
+    return douglas_peucker(drop_collinear(store), tolerance)
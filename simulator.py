@@ -0,0 +1,214 @@
+import math
+import numpy as np
+
+PLOTTER_UNITS_PER_MM = 40
+
+
+def pe_values(body, bits=6):
+    """Decodes the HP-GL/2 `PE` parameter bytes into a list of tokens:
+    flag characters as one-byte strings and numbers as ints.
+    """
+    terminator = 191 if bits == 6 else 95
+    tokens = []
+    value = shift = 0
+    for byte in body:
+        if byte in b"<>=:7":
+            if byte == ord("7"):
+                bits, terminator = 5, 95
+            tokens.append(chr(byte))
+            continue
+        if byte < 63:
+            continue
+        if byte >= terminator:
+            value |= (byte - terminator) << shift
+            tokens.append(value >> 1 if value % 2 == 0 else -(value >> 1))
+            value = shift = 0
+        else:
+            value |= (byte - 63) << shift
+            shift += bits
+    return tokens
+
+
+class SimulatedPlotter:
+    """A stand-in for a chiplotle plotter that accepts the HPGL a
+    `Drawing` sends and works out how long a real plotter would take.
+
+    Every vertex is a separate move that accelerates from and decelerates
+    to a stop. Pen-down and pen-up moves have their own top speed, each
+    pen lift or drop costs a fixed time, and the serial link moves
+    10 bits per byte at `baud`. The plotter buffers commands, so the job
+    takes as long as the slower of the mechanism and the link.
+
+    Speeds are in plotter units per second and acceleration in plotter
+    units per second squared.
+    """
+
+    def __init__(self, pen_down_speed=380 * PLOTTER_UNITS_PER_MM,
+                 pen_up_speed=500 * PLOTTER_UNITS_PER_MM,
+                 acceleration=4000 * PLOTTER_UNITS_PER_MM,
+                 pen_lift_time=0.03, pen_drop_time=0.03, baud=9600):
+        self.pen_down_speed = pen_down_speed
+        self.pen_up_speed = pen_up_speed
+        self.acceleration = acceleration
+        self.pen_lift_time = pen_lift_time
+        self.pen_drop_time = pen_drop_time
+        self.baud = baud
+        self.reset()
+
+    def reset(self):
+        self.bytes_received = 0
+        self.pending = b""
+        self.position = (0, 0)
+        self.pen_down = False
+        self.relative = False
+        self.pen = 0
+        self.pen_changes = 0
+        self.lifts = 0
+        self.drops = 0
+        # (dx, dy) of every move, split by pen state
+        self.moves = {True: [], False: []}
+
+    def write(self, data):
+        """Accepts HPGL as bytes or str, the way chiplotle plotters do."""
+        if isinstance(data, str):
+            data = data.encode("latin-1")
+        elif hasattr(data, "format"):
+            # a chiplotle command object
+            data = data.format.encode("latin-1") \
+                if isinstance(data.format, str) else data.format()
+        self.bytes_received += len(data)
+        commands = (self.pending + data).split(b";")
+        self.pending = commands.pop()
+        for command in commands:
+            self.execute(command)
+
+    def execute(self, command):
+        command = command.strip()
+        name, body = command[:2].upper(), command[2:]
+        if name == b"PU":
+            self.set_pen(False)
+            self.move_to(self.parse_numbers(body))
+        elif name == b"PD":
+            self.set_pen(True)
+            self.move_to(self.parse_numbers(body))
+        elif name == b"PA":
+            self.relative = False
+            self.move_to(self.parse_numbers(body))
+        elif name == b"PR":
+            self.relative = True
+            self.move_to(self.parse_numbers(body))
+        elif name == b"PE":
+            self.polyline_encoded(body)
+        elif name == b"SP":
+            self.select_pen(int(float(body or 0)))
+        elif name == b"IN":
+            self.set_pen(False)
+            self.relative = False
+
+    def parse_numbers(self, body):
+        if not body.strip():
+            return np.zeros((0, 2))
+        return np.array(body.split(b","), dtype=np.float64).reshape(-1, 2)
+
+    def set_pen(self, down):
+        if down and not self.pen_down:
+            self.drops += 1
+        elif self.pen_down and not down:
+            self.lifts += 1
+        self.pen_down = down
+
+    def select_pen(self, pen):
+        self.set_pen(False)
+        if pen != self.pen:
+            self.pen_changes += 1
+        self.pen = pen
+
+    def move_to(self, points):
+        if not len(points):
+            return
+        if self.relative:
+            deltas = points
+            end = np.asarray(self.position) + points.sum(axis=0)
+        else:
+            path = np.vstack([self.position, points])
+            deltas = np.diff(path, axis=0)
+            end = points[-1]
+        self.moves[self.pen_down].append(deltas)
+        self.position = (float(end[0]), float(end[1]))
+
+    def polyline_encoded(self, body):
+        tokens = pe_values(body)
+        pen_up_next = absolute_next = False
+        numbers = []
+        index = 0
+        while index < len(tokens):
+            token = tokens[index]
+            index += 1
+            if token == "<":
+                pen_up_next = True
+            elif token == "=":
+                absolute_next = True
+            elif token in (">", ":"):
+                if token == ":":
+                    self.select_pen(tokens[index])
+                index += 1
+            elif token == "7":
+                continue
+            else:
+                numbers.append(token)
+                if len(numbers) < 2:
+                    continue
+                point = np.array([numbers], dtype=np.float64)
+                numbers = []
+                relative = self.relative
+                self.relative = not absolute_next
+                self.set_pen(not pen_up_next)
+                self.move_to(point)
+                self.relative = relative
+                pen_up_next = absolute_next = False
+        self.set_pen(False)
+
+    def move_time(self, deltas, speed):
+        """Seconds to make each move from rest to rest with a trapezoidal
+        (or, for short moves, triangular) velocity profile.
+        """
+        distance = np.hypot(deltas[:, 0], deltas[:, 1])
+        distance = distance[distance > 0]
+        accel = float(self.acceleration)
+        ramp = speed * speed / accel
+        return float(np.where(
+            distance >= ramp,
+            distance / speed + speed / accel,
+            2 * np.sqrt(distance / accel)).sum()), float(distance.sum())
+
+    def estimate(self):
+        """Returns the estimated job duration in seconds along with the
+        figures it is built from.
+        """
+        down = np.vstack(self.moves[True] or [np.zeros((0, 2))])
+        up = np.vstack(self.moves[False] or [np.zeros((0, 2))])
+        down_time, down_distance = self.move_time(down, self.pen_down_speed)
+        up_time, up_distance = self.move_time(up, self.pen_up_speed)
+        pen_time = self.lifts * self.pen_lift_time + \
+            self.drops * self.pen_drop_time
+        mechanical = down_time + up_time + pen_time
+        serial = self.bytes_received * 10.0 / self.baud
+        return {
+            "duration": max(mechanical, serial),
+            "mechanical_time": mechanical,
+            "serial_time": serial,
+            "pen_down_time": down_time,
+            "pen_up_time": up_time,
+            "pen_lift_time": pen_time,
+            "pen_down_distance": down_distance,
+            "pen_up_distance": up_distance,
+            "lifts": self.lifts,
+            "pen_changes": self.pen_changes,
+            "bytes": self.bytes_received,
+            }
+
+
+def format_duration(seconds):
+    hours, rest = divmod(int(math.ceil(seconds)), 3600)
+    minutes, seconds = divmod(rest, 60)
+    return "{}:{:02d}:{:02d}".format(hours, minutes, seconds)
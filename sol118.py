@@ -1,8 +1,10 @@
+import time
+import numpy as np
 from plotter import Drawing
+from instrument import NULL
 from shapely.geometry import LineString, Point, GeometryCollection
 from shapely.affinity import scale, rotate, translate
-from shapely.ops import cascaded_union
-from random import uniform, seed as set_seed
+from random import Random
 from math import floor
 
 
@@ -11,7 +13,6 @@ def points_to_coord_tuples(points):
 
 
 def interpolate_along_line(numPoints, the_line):
-    print("the line before:", len(the_line.xy[0]))
     '''
     Returns a new LineString that interpolates n points along the line.
     '''
@@ -20,41 +21,182 @@ def interpolate_along_line(numPoints, the_line):
         newPoint = the_line.interpolate(float(x)/numPoints, normalized=True)
         points.append(newPoint)
     coords = points_to_coord_tuples(points)
-    output_line = LineString(coords)
-    print("the line after:", len(output_line.xy[0]))
     return LineString(coords)
 
 
-def run(seed_int):
-    set_seed(seed_int)
-    drawing = Drawing()
+def interpolate_lines(endpoints, numPoints):
+    '''
+    Returns an array of shape (n, numPoints + 1, 2) holding every line in
+    `endpoints` (shape (n, 2, 2): start and end coordinates per line)
+    densified to numPoints + 1 evenly spaced vertices.
+    '''
+    endpoints = np.asarray(endpoints, dtype=np.float64)
+    starts = endpoints[:, 0, :]
+    deltas = endpoints[:, 1, :] - starts
+    steps = np.linspace(0.0, 1.0, numPoints + 1)
+    return starts[:, None, :] + deltas[:, None, :] * steps[None, :, None]
+
+
+def complete_graph_endpoints(coords):
+    '''
+    Returns the endpoints of a line from every coordinate to every other
+    coordinate, ordered by (start, end) index.
+    '''
+    coords = np.asarray(coords, dtype=np.float64)
+    count = len(coords)
+    starts, ends = np.nonzero(~np.eye(count, dtype=bool))
+    return np.stack([coords[starts], coords[ends]], axis=1)
+
+
+def random_points(seed_int, point_count=50, margins=(2, 2)):
+    '''
+    Returns `point_count` random points on the paper, at least `margins`
+    (horizontal, vertical) inches from its edges, drawn from an RNG of
+    their own seeded with `seed_int`.
+    '''
+    rng = Random(seed_int)
     x_offset = -11.5
     y_offset = -8.5
-    horizontal_margin = 2
-    vertical_margin = 2
+    horizontal_margin, vertical_margin = margins
     point_x_min = horizontal_margin
     point_x_max = 24 - horizontal_margin
     point_y_min = vertical_margin
     point_y_max = 18 - vertical_margin
-    points = [
+    return [
         Point(
-            uniform(point_x_min, point_x_max) + x_offset,
-            uniform(point_y_min, point_y_max) + y_offset)
-        for x in range(50)
+            rng.uniform(point_x_min, point_x_max) + x_offset,
+            rng.uniform(point_y_min, point_y_max) + y_offset)
+        for x in range(point_count)
         ]
-    coord_tuples = points_to_coord_tuples(points)
-    for e,coord_tuple in enumerate(coord_tuples):
-        for i in range(50):
-            if e != i:
-                line = LineString([coord_tuple, coord_tuples[i]])
-                line = interpolate_along_line(10, line)
-                drawing.add(line)
-    # line = LineString([(0, 0), (drawing.width, drawing.height)])
-    drawing.add(line)
+
+
+def generate_lines(seed_int, point_count=50, samples=10, margins=(2, 2)):
+    '''
+    Returns every line of the complete graph on a seed's points,
+    densified to `samples` + 1 vertices, as an (n, samples + 1, 2) array.
+    '''
+    coord_tuples = points_to_coord_tuples(
+        random_points(seed_int, point_count, margins))
+    endpoints = complete_graph_endpoints(coord_tuples)
+    return interpolate_lines(endpoints, samples)
+
+
+def iter_line_chunks(coords, samples=10, chunk_size=10000, unique=True):
+    '''
+    Lazily yields the densified lines of the complete graph on `coords`
+    in (n, samples + 1, 2) batches of about `chunk_size` lines. With
+    `unique`, each pair of points is drawn once rather than once in each
+    direction.
+    '''
+    coords = np.asarray(coords, dtype=np.float64)
+    count = len(coords)
+    pending = []
+    pending_count = 0
+    for e in range(count):
+        if unique:
+            ends = np.arange(e + 1, count)
+        else:
+            ends = np.delete(np.arange(count), e)
+        if not len(ends):
+            continue
+        starts = np.broadcast_to(coords[e], (len(ends), 2))
+        pending.append(np.stack([starts, coords[ends]], axis=1))
+        pending_count += len(ends)
+        if pending_count >= chunk_size:
+            yield interpolate_lines(np.concatenate(pending), samples)
+            pending, pending_count = [], 0
+    if pending:
+        yield interpolate_lines(np.concatenate(pending), samples)
+
+
+def run_streaming(seed_int, point_count=2000, samples=10, hpgl_sink=None,
+                  encoding="absolute", unique=True, clip_paths=True,
+                  chunk_size=10000, instrument=NULL, thumbnail=False):
+    '''
+    Draws a seed without ever holding the whole drawing: lines are
+    generated a batch at a time and go straight to the SVG preview and,
+    if given, an HPGL file or file-like sink. Memory stays flat as
+    `point_count` grows. With `thumbnail`, a level-of-detail preview
+    small enough to open quickly is written next to the full one.
+    '''
+    drawing = Drawing(instrument=instrument)
+    coords = points_to_coord_tuples(random_points(seed_int, point_count))
+    chunks = iter_line_chunks(coords, samples, chunk_size, unique)
+    drawing.stream(
+        chunks,
+        svg_path='previews/preview-seed-' + str(seed_int) + '.svg',
+        hpgl_sink=hpgl_sink,
+        encoding=encoding,
+        clip_paths=clip_paths,
+        pack=True,
+        thumbnail_path=(
+            'previews/thumbnail-seed-' + str(seed_int) + '.svg'
+            if thumbnail else None))
+    if instrument.enabled:
+        instrument.write_report(
+            'previews/report-seed-' + str(seed_int) + '.json')
+    return drawing
+
+
+def run(seed_int, instrument=NULL, point_count=50, samples=10,
+        margins=(2, 2), cache=None):
+    '''
+    Draws a seed and writes its SVG preview. With an
+    `instrument.Instrumentation`, also writes a JSON report of where the
+    time went next to the preview. With a `cache.DrawingCache`, a seed
+    drawn before with the same parameters is loaded instead of
+    regenerated.
+    '''
+    drawing = Drawing(instrument=instrument)
+    params = dict(
+        seed=seed_int, point_count=point_count, samples=samples,
+        margins=list(margins), scalar=drawing.scalar)
+    cached = cache.get(**params) if cache else None
+    if cached is not None:
+        drawing.store = cached
+        instrument.count("cache_hits")
+    else:
+        with instrument.stage("generate"):
+            lines = generate_lines(seed_int, point_count, samples, margins)
+        drawing.add_lines(lines)
+        drawing.dedupe()
+        if cache:
+            cache.put(drawing.store, **params)
     drawing.preview(filepath='previews/preview-seed-' + str(seed_int) + '.svg')
     # drawing.plot()
+    if instrument.enabled:
+        instrument.write_report(
+            'previews/report-seed-' + str(seed_int) + '.json')
     return drawing
 
+
+def time_run(seed_int):
+    start = time.perf_counter()
+    run(seed_int)
+    return seed_int, time.perf_counter() - start
+
+
+def run_batch(seeds, processes=None):
+    '''
+    Generates and previews every seed across a process pool, printing
+    progress and per-seed timing as each one finishes. Each seed gets its
+    own RNG, so the output matches running the seeds one by one.
+
+    Returns a dict of seconds spent per seed.
+    '''
+    from multiprocessing import Pool
+    seeds = list(seeds)
+    timings = {}
+    start = time.perf_counter()
+    with Pool(processes) as pool:
+        for seed_int, seconds in pool.imap_unordered(time_run, seeds):
+            timings[seed_int] = seconds
+            print("[{}/{}] seed {}: {:.2f}s".format(
+                len(timings), len(seeds), seed_int, seconds))
+    print("{} seeds in {:.2f}s".format(
+        len(seeds), time.perf_counter() - start))
+    return timings
+
+
 if __name__ == '__main__':
-    for seed_int in range(3):
-        drawing = run(seed_int)
+    run_batch(range(3))
@@ -0,0 +1,188 @@
+import numpy as np
+
+
+def geom_coords(geom):
+    """Yields one (n, 2) float64 array per line or ring in a shapely
+    geometry, walking polygons and collections the same way
+    `Drawing.plot_geom` does.
+    """
+    if hasattr(type(geom), 'geoms'):
+        # assume this is a collection of objects; checked first because
+        # shapely 2 multi-part geometries raise on `.coords`
+        for part in geom.geoms:
+            for coords in geom_coords(part):
+                yield coords
+    elif hasattr(geom, 'exterior'):
+        # assume it has a Polygon-like interface
+        for coords in geom_coords(geom.exterior):
+            yield coords
+        for ring in geom.interiors:
+            for coords in geom_coords(ring):
+                yield coords
+    elif hasattr(geom, 'coords'):
+        # assume it is a point, linear ring or linestring
+        coords = np.asarray(geom.coords, dtype=np.float64)
+        if len(coords):
+            yield coords[:, :2]
+    else:
+        raise NotImplementedError(
+            "I don't know how to store {}".format(type(geom)))
+
+
+class PathStore:
+    """Holds many polylines as one contiguous float64 coordinate buffer
+    plus an offsets array.
+
+    Path `i` is `coords[offsets[i]:offsets[i + 1]]`. Both buffers grow
+    by doubling, so appending stays cheap and no per-path Python objects
+    are kept around.
+    """
+
+    def __init__(self, capacity=1024):
+        self._coords = np.empty((max(capacity, 1), 2), dtype=np.float64)
+        self._offsets = np.zeros(max(capacity, 1) + 1, dtype=np.int64)
+        self._vertex_count = 0
+        self._path_count = 0
+
+    @classmethod
+    def from_arrays(cls, coords, offsets):
+        """Builds a store that wraps existing coordinate and offset
+        arrays without copying them.
+        """
+        store = cls.__new__(cls)
+        store._coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        store._offsets = np.asarray(offsets, dtype=np.int64)
+        store._path_count = len(store._offsets) - 1
+        store._vertex_count = int(store._offsets[-1])
+        return store
+
+    @classmethod
+    def concatenate(cls, stores):
+        """Joins several stores into a new one, keeping path order."""
+        stores = list(stores)
+        store = cls(capacity=sum(s.vertex_count for s in stores))
+        for other in stores:
+            store.extend_ragged(other.coords, other.offsets)
+        return store
+
+    def read_only(self):
+        """A view of the paths in this store whose arrays cannot be
+        written. Appending to it copies into new buffers, so this store
+        never sees the change.
+        """
+        coords = self.coords.view()
+        offsets = self.offsets.view()
+        coords.flags.writeable = False
+        offsets.flags.writeable = False
+        return PathStore.from_arrays(coords, offsets)
+
+    def __len__(self):
+        return self._path_count
+
+    def __iter__(self):
+        coords = self.coords
+        offsets = self.offsets
+        for start, end in zip(offsets[:-1], offsets[1:]):
+            yield coords[start:end]
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._path_count
+        if not 0 <= index < self._path_count:
+            raise IndexError("path index out of range")
+        start, end = self._offsets[index], self._offsets[index + 1]
+        return self._coords[start:end]
+
+    @property
+    def coords(self):
+        """All vertices of every path, shape (vertex_count, 2)."""
+        return self._coords[:self._vertex_count]
+
+    @property
+    def offsets(self):
+        """Start index of every path in `coords`, plus the end sentinel."""
+        return self._offsets[:self._path_count + 1]
+
+    @property
+    def vertex_count(self):
+        return self._vertex_count
+
+    def lengths(self):
+        """Number of vertices in each path."""
+        return np.diff(self.offsets)
+
+    def bounding_boxes(self):
+        """Returns (minx, miny, maxx, maxy) of every path as an (n, 4)
+        array.
+        """
+        if not self._path_count:
+            return np.zeros((0, 4), dtype=np.float64)
+        starts = self.offsets[:-1]
+        return np.hstack([
+            np.minimum.reduceat(self.coords, starts, axis=0),
+            np.maximum.reduceat(self.coords, starts, axis=0),
+            ])
+
+    def select(self, indices):
+        """Returns a new store holding only the paths at `indices`, in
+        that order.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        offsets = self.offsets
+        lengths = np.diff(offsets)[indices]
+        new_offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=new_offsets[1:])
+        source = np.repeat(offsets[:-1][indices] - new_offsets[:-1],
+                           lengths) + np.arange(new_offsets[-1])
+        return PathStore.from_arrays(self.coords[source], new_offsets)
+
+    def _reserve(self, vertex_count, path_count):
+        if self._vertex_count + vertex_count > len(self._coords):
+            size = max(len(self._coords) * 2,
+                       self._vertex_count + vertex_count)
+            coords = np.empty((size, 2), dtype=np.float64)
+            coords[:self._vertex_count] = self.coords
+            self._coords = coords
+        if self._path_count + path_count + 1 > len(self._offsets):
+            size = max(len(self._offsets) * 2,
+                       self._path_count + path_count + 1)
+            offsets = np.zeros(size, dtype=np.int64)
+            offsets[:self._path_count + 1] = self.offsets
+            self._offsets = offsets
+
+    def append(self, coords):
+        """Adds a single path given as an (n, 2) array-like."""
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        self._reserve(len(coords), 1)
+        start = self._vertex_count
+        self._coords[start:start + len(coords)] = coords
+        self._vertex_count += len(coords)
+        self._path_count += 1
+        self._offsets[self._path_count] = self._vertex_count
+
+    def extend(self, paths):
+        """Adds many paths of equal length given as an (n, k, 2) array."""
+        paths = np.asarray(paths, dtype=np.float64)
+        count, length = paths.shape[:2]
+        self._reserve(count * length, count)
+        start = self._vertex_count
+        self._coords[start:start + count * length] = paths.reshape(-1, 2)
+        self._offsets[self._path_count + 1:self._path_count + count + 1] = \
+            start + length * np.arange(1, count + 1)
+        self._vertex_count += count * length
+        self._path_count += count
+
+    def extend_ragged(self, coords, offsets):
+        """Adds many paths given in the same coordinate buffer plus offsets
+        layout the store itself uses.
+        """
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        count = len(offsets) - 1
+        self._reserve(len(coords), count)
+        start = self._vertex_count
+        self._coords[start:start + len(coords)] = coords
+        self._offsets[self._path_count + 1:self._path_count + count + 1] = \
+            start + offsets[1:] - offsets[0]
+        self._vertex_count += len(coords)
+        self._path_count += count
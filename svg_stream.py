@@ -0,0 +1,124 @@
+import numpy as np
+
+SVG_HEADER = (
+    '<?xml version="1.0" encoding="utf-8" ?>\n'
+    '<svg baseProfile="full" height="{height}" style="{style}" '
+    'version="1.1" viewBox="{viewbox}" width="{width}" '
+    'xmlns="http://www.w3.org/2000/svg" '
+    'xmlns:ev="http://www.w3.org/2001/xml-events" '
+    'xmlns:xlink="http://www.w3.org/1999/xlink">'
+    )
+
+
+def format_coords(coords, precision=2):
+    """Formats an (n, 2) array as "x,y" strings, one per vertex."""
+    text = np.round(coords, precision).astype(str)
+    return np.char.add(np.char.add(text[:, 0], ","), text[:, 1]).tolist()
+
+
+def attributes(**kwargs):
+    """Formats keyword arguments as SVG attributes, turning
+    `stroke_width` into `stroke-width` the way svgwrite does.
+    """
+    return " ".join(
+        '{}="{}"'.format(key.replace("_", "-"), value)
+        for key, value in sorted(kwargs.items()))
+
+
+def rect_markup(x, y, width, height, **kwargs):
+    return "<rect {} />".format(attributes(
+        x=x, y=y, width=width, height=height, **kwargs))
+
+
+class SVGStreamWriter:
+    """Writes an SVG file incrementally, so memory use does not depend on
+    how many polylines go into it.
+
+    Polylines are written `chunk_size` paths at a time, either as one
+    `<polyline>` per path or, with `pack`, as a single `<path>` per chunk.
+    """
+
+    def __init__(self, filepath, width, height, viewbox, style="",
+                 chunk_size=1000, pack=False, precision=2):
+        self.filepath = filepath
+        self.chunk_size = chunk_size
+        self.pack = pack
+        self.precision = precision
+        self.stroke = dict(stroke="black", stroke_width="1", fill="none")
+        self.file = open(filepath, "w")
+        self.file.write(SVG_HEADER.format(
+            width=width, height=height, style=style,
+            viewbox=",".join(str(value) for value in viewbox)))
+        self.open_groups = 0
+        # markup written after all groups are closed
+        self.trailer = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def start_group(self, **kwargs):
+        self.file.write("<g {}>".format(attributes(**kwargs)))
+        self.open_groups += 1
+
+    def end_group(self):
+        self.file.write("</g>")
+        self.open_groups -= 1
+
+    def rect(self, x, y, width, height, **kwargs):
+        self.file.write(rect_markup(x, y, width, height, **kwargs))
+
+    def write_store(self, store, **kwargs):
+        """Writes every path of a `PathStore`, a chunk at a time."""
+        offsets = store.offsets
+        for first in range(0, len(store), self.chunk_size):
+            last = min(first + self.chunk_size, len(store))
+            start, end = offsets[first], offsets[last]
+            self.write_paths(
+                store.coords[start:end], offsets[first:last + 1] - start,
+                **kwargs)
+
+    def write_paths(self, coords, offsets, **kwargs):
+        """Writes the paths held in a coordinate buffer plus offsets."""
+        style = dict(self.stroke, **kwargs)
+        points = format_coords(coords, self.precision)
+        bounds = list(zip(offsets[:-1].tolist(), offsets[1:].tolist()))
+        if self.pack:
+            d = " ".join(
+                "M" + points[start] + (
+                    " L" + " ".join(points[start + 1:end])
+                    if end - start > 1 else "")
+                for start, end in bounds)
+            self.file.write('<path d="{}" {} />'.format(d, attributes(**style)))
+            return
+        style = attributes(**style)
+        self.file.write("".join(
+            '<polyline points="{}" {} />'.format(
+                " ".join(points[start:end]), style)
+            for start, end in bounds))
+
+    def closing_markup(self):
+        return "</g>" * self.open_groups + "".join(self.trailer) + "</svg>\n"
+
+    def snapshot(self):
+        """Leaves a complete SVG on disk without closing the writer. The
+        closing markup is written after everything so far and then
+        written over by whatever comes next.
+        """
+        position = self.file.tell()
+        self.file.write(self.closing_markup())
+        self.file.truncate()
+        self.file.flush()
+        self.file.seek(position)
+
+    def close(self):
+        if self.file.closed:
+            return
+        while self.open_groups:
+            self.end_group()
+        self.file.write("".join(self.trailer))
+        self.file.write("</svg>\n")
+        self.file.truncate()
+        self.file.close()
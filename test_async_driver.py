@@ -0,0 +1,64 @@
+import asyncio
+import os
+import tty
+import numpy as np
+import pytest
+import async_driver
+from plotter import Drawing
+
+
+def random_drawing(seed=0, count=200, pens=(None,)):
+    rng = np.random.default_rng(seed)
+    drawing = Drawing()
+    for pen in pens:
+        drawing.add_lines(rng.uniform(0, 8, (count, 5, 2)), pen=pen)
+    return drawing
+
+
+@pytest.mark.parametrize("encoding", ["absolute", "relative", "pe"])
+def test_pseudo_plotter_receives_the_compiled_job(encoding):
+    drawing = random_drawing(pens=(1, 2))
+    pseudo = async_driver.PseudoPlotter(
+        buffer_size=1024, bytes_per_second=200000.0)
+    try:
+        sent = drawing.plot_async(
+            pseudo.device_path, encoding=encoding, batch_paths=50)
+    finally:
+        received = pseudo.finish(timeout=10)
+    expected = drawing.compile_hpgl(encoding)
+    assert sent == len(expected)
+    assert received == expected
+    assert not pseudo.overflowed
+
+
+def test_compile_error_is_raised_instead_of_hanging():
+    drawing = random_drawing()
+    pseudo = async_driver.PseudoPlotter()
+    fd = async_driver.open_device(pseudo.device_path)
+    try:
+        with pytest.raises(ValueError, match="encoding"):
+            asyncio.run(asyncio.wait_for(async_driver.plot(
+                drawing.plot_layers(), fd, encoding="bogus"), 10))
+    finally:
+        os.close(fd)
+        pseudo.finish(timeout=1)
+
+
+def test_unanswered_buffer_query_times_out():
+    drawing = random_drawing()
+    # a terminal nobody reads from or answers
+    master, slave = os.openpty()
+    tty.setraw(master)
+    fd = async_driver.open_device(os.ttyname(slave))
+    try:
+        with pytest.raises(TimeoutError, match="ESC . B"):
+            asyncio.run(asyncio.wait_for(async_driver.plot(
+                drawing.plot_layers(), fd, reply_timeout=0.2), 10))
+    finally:
+        for descriptor in (fd, slave, master):
+            os.close(descriptor)
+
+
+def test_unsupported_baud_rate_is_rejected():
+    with pytest.raises(ValueError, match="baud"):
+        async_driver.open_device("/dev/null", baud=115200)
@@ -0,0 +1,64 @@
+import io
+import numpy as np
+import pytest
+from plotter import Drawing
+from simulator import SimulatedPlotter
+
+
+class CutOffSink(io.BytesIO):
+    """A sink that fails, like an unplugged plotter, once `writes` writes
+    have gone through.
+    """
+
+    def __init__(self, writes):
+        super().__init__()
+        self.writes = writes
+
+    def write(self, data):
+        if not self.writes:
+            raise OSError("plotter went away")
+        self.writes -= 1
+        return super().write(data)
+
+
+def layered_drawing(seed=0, count=40):
+    rng = np.random.default_rng(seed)
+    drawing = Drawing()
+    for pen in (None, 1, 3):
+        drawing.add_lines(rng.uniform(0, 8, (count, 4, 2)), pen=pen)
+    return drawing
+
+
+def simulate(*streams):
+    plotter = SimulatedPlotter()
+    for stream in streams:
+        plotter.write(stream)
+    return plotter.estimate()
+
+
+@pytest.mark.parametrize("encoding", ["absolute", "relative", "pe"])
+# cut off inside the first layer, on a layer boundary and inside the last
+@pytest.mark.parametrize("writes", [15, 42, 100])
+def test_resumed_job_draws_the_same_as_an_uninterrupted_one(
+        tmp_path, encoding, writes):
+    journal = str(tmp_path / "job.journal")
+    whole = simulate(layered_drawing().compile_hpgl(encoding))
+
+    cut = CutOffSink(writes)
+    with pytest.raises(OSError):
+        layered_drawing().plot(sink=cut, encoding=encoding, journal=journal)
+    rest = io.BytesIO()
+    layered_drawing().resume(journal, sink=rest, encoding=encoding)
+    resumed = simulate(cut.getvalue(), rest.getvalue())
+
+    assert resumed["pen_down_distance"] == pytest.approx(
+        whole["pen_down_distance"])
+    assert resumed["lifts"] == whole["lifts"]
+    assert resumed["pen_changes"] == whole["pen_changes"]
+
+
+def test_journal_of_another_drawing_is_refused(tmp_path):
+    journal = str(tmp_path / "job.journal")
+    layered_drawing(seed=0).plot(sink=io.BytesIO(), journal=journal)
+    with pytest.raises(ValueError, match="different plot job"):
+        layered_drawing(seed=1).resume(journal, sink=io.BytesIO())
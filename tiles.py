@@ -0,0 +1,242 @@
+import json
+import math
+import os
+import numpy as np
+from store import PathStore
+import clip
+import hpgl_compiler
+from transform import Affine
+from plotter import Drawing, pen_order
+
+MARK_GAP = 50
+MARK_LENGTH = 250
+
+
+def tile_grid(bounds, tile_width, tile_height):
+    """Number of columns and rows of `tile_width` x `tile_height` tiles
+    needed to cover `bounds` (minx, miny, maxx, maxy).
+    """
+    minx, miny, maxx, maxy = bounds
+    columns = max(1, int(math.ceil((maxx - minx) / tile_width)))
+    rows = max(1, int(math.ceil((maxy - miny) / tile_height)))
+    return columns, rows
+
+
+def index_paths(store, origin, tile_width, tile_height, columns, rows):
+    """Buckets the paths of a store by the tiles their bounding boxes
+    overlap, on a uniform grid of tiles starting at `origin`.
+
+    Returns a dict of (column, row) -> indices of the paths that may
+    cross that tile. A path spanning several tiles is listed in each.
+    """
+    if not len(store):
+        return {}
+    boxes = store.bounding_boxes()
+    size = np.array([tile_width, tile_height] * 2)
+    cells = np.floor((boxes - np.tile(origin, 2)) / size).astype(np.int64)
+    cells = np.clip(cells, 0, [columns - 1, rows - 1] * 2)
+    spans = cells[:, 2:] - cells[:, :2] + 1
+    counts = spans[:, 0] * spans[:, 1]
+    paths = np.repeat(np.arange(len(store)), counts)
+    # position of each (path, tile) pair within its path's block of tiles
+    within = np.arange(len(paths)) - np.repeat(np.cumsum(counts) - counts,
+                                               counts)
+    column = cells[paths, 0] + within % spans[paths, 0]
+    row = cells[paths, 1] + within // spans[paths, 0]
+    keys = row * columns + column
+    order = np.argsort(keys, kind="stable")
+    unique, starts = np.unique(keys[order], return_index=True)
+    return {
+        (key % columns, key // columns): members
+        for key, members in zip(unique.tolist(),
+                                np.split(paths[order], starts[1:]))
+    }
+
+
+def registration_marks(bounds, gap=MARK_GAP, length=MARK_LENGTH):
+    """Corner marks just outside a tile, as a store of two-point paths:
+    at every corner one tick along each edge, pointing away from the
+    tile, starting `gap` units clear of it.
+    """
+    minx, miny, maxx, maxy = bounds
+    marks = []
+    for x, dx in ((minx, -1), (maxx, 1)):
+        for y, dy in ((miny, -1), (maxy, 1)):
+            marks.append([(x + dx * gap, y), (x + dx * (gap + length), y)])
+            marks.append([(x, y + dy * gap), (x, y + dy * (gap + length))])
+    store = PathStore(capacity=len(marks) * 2)
+    store.extend(marks)
+    return store
+
+
+class Tiling:
+    """Splits one large drawing into sheet-sized tiles.
+
+    Tiles are `tile_width` x `tile_height` plotter units and cover the
+    bounding box of all paths, starting from its lower left corner.
+    Each tile is clipped out of the drawing and moved so that its lower
+    left corner lands on `sheet_origin`, the same spot on the bed for
+    every sheet.
+    """
+
+    def __init__(self, layers, tile_width, tile_height, sheet_origin,
+                 marks=True, mark_pen=None):
+        self.layers = hpgl_compiler.as_layers(layers)
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.sheet_origin = sheet_origin
+        self.marks = marks
+        self.mark_pen = mark_pen
+        boxes = [store.bounding_boxes() for _, store in self.layers]
+        boxes = np.vstack(boxes) if boxes else np.zeros((0, 4))
+        if len(boxes):
+            self.bounds = (boxes[:, 0].min(), boxes[:, 1].min(),
+                           boxes[:, 2].max(), boxes[:, 3].max())
+        else:
+            self.bounds = (0.0, 0.0, 0.0, 0.0)
+        self.origin = np.array(self.bounds[:2])
+        self.columns, self.rows = tile_grid(
+            self.bounds, tile_width, tile_height)
+        self.index = [
+            index_paths(store, self.origin, tile_width, tile_height,
+                        self.columns, self.rows)
+            for _, store in self.layers
+        ]
+
+    def __len__(self):
+        return self.columns * self.rows
+
+    def tile_bounds(self, column, row):
+        """The area a tile covers in drawing coordinates."""
+        minx = self.origin[0] + column * self.tile_width
+        miny = self.origin[1] + row * self.tile_height
+        return (minx, miny, minx + self.tile_width, miny + self.tile_height)
+
+    def to_sheet(self, column, row):
+        """Transform from drawing coordinates to the bed for a tile."""
+        minx, miny = self.tile_bounds(column, row)[:2]
+        return Affine.translate(self.sheet_origin[0] - minx,
+                                self.sheet_origin[1] - miny)
+
+    def tile(self, column, row):
+        """The (pen, store) layers of one tile, clipped and placed on the
+        bed, with its registration marks added to the layer of
+        `mark_pen`.
+        """
+        bounds = self.tile_bounds(column, row)
+        to_sheet = self.to_sheet(column, row)
+        layers = []
+        for (pen, store), index in zip(self.layers, self.index):
+            members = index.get((column, row))
+            if members is None:
+                continue
+            clipped = clip.clip(store.select(members), bounds)
+            if len(clipped):
+                layers.append((pen, to_sheet.apply_store(clipped)))
+        if self.marks:
+            marks = to_sheet.apply_store(registration_marks(bounds))
+            layers = merge_layer(layers, self.mark_pen, marks)
+        return layers
+
+    def tiles(self):
+        """Yields the name, column, row and layers of every tile that has
+        something to draw, row by row from the bottom.
+        """
+        for row in range(self.rows):
+            for column in range(self.columns):
+                if self.has_paths(column, row):
+                    yield (tile_name(column, row), column, row,
+                           self.tile(column, row))
+
+    def has_paths(self, column, row):
+        return any((column, row) in index for index in self.index)
+
+    def manifest(self):
+        """Where each sheet belongs in the full drawing."""
+        return {
+            "tile_width": self.tile_width,
+            "tile_height": self.tile_height,
+            "columns": self.columns,
+            "rows": self.rows,
+            "bounds": [float(value) for value in self.bounds],
+            "tiles": {
+                tile_name(column, row): {
+                    "column": column,
+                    "row": row,
+                    "bounds": [float(value) for value in
+                               self.tile_bounds(column, row)],
+                    }
+                for row in range(self.rows)
+                for column in range(self.columns)
+                if self.has_paths(column, row)
+                },
+            }
+
+
+def merge_layer(layers, pen, store):
+    """Adds `store` to the layer of `pen`, keeping layers in plot order."""
+    merged = dict(layers)
+    if pen in merged:
+        merged[pen] = PathStore.concatenate([merged[pen], store])
+    else:
+        merged[pen] = store
+    return sorted(merged.items(), key=lambda item: pen_order(item[0]))
+
+
+def tile_name(column, row):
+    return "tile-r{:02d}-c{:02d}".format(row, column)
+
+
+# the tiling a worker process cuts its tiles from, set once per worker
+_worker_tiling = None
+
+
+def set_worker_tiling(tiling):
+    global _worker_tiling
+    _worker_tiling = tiling
+
+
+def render_tile(job):
+    """Clips one tile out of the worker's tiling, compiles it to HPGL
+    and writes its SVG preview. Only the tile's position travels with
+    the job, so each worker holds one tile at a time.
+    """
+    column, row, directory, encoding, preview = job
+    name = tile_name(column, row)
+    drawing = Drawing()
+    drawing.layers = dict(_worker_tiling.tile(column, row))
+    prefix = os.path.join(directory, name)
+    drawing.spool(prefix + ".hpgl", encoding=encoding)
+    if preview:
+        drawing.preview(prefix + ".svg", pack=True)
+    return name, drawing.path_count()
+
+
+def write_tiles(tiling, directory, encoding="absolute", preview=True,
+                processes=None):
+    """Writes `<tile>.hpgl` and, with `preview`, `<tile>.svg` for every
+    tile into `directory`, plus `tiles.json` describing the layout.
+    Tiles are clipped, compiled and previewed on a process pool; the
+    tiling is handed to each worker once, when the pool starts.
+
+    Returns a dict of tile name -> number of paths written.
+    """
+    from multiprocessing import Pool
+    os.makedirs(directory, exist_ok=True)
+    jobs = [
+        (column, row, directory, encoding, preview)
+        for row in range(tiling.rows)
+        for column in range(tiling.columns)
+        if tiling.has_paths(column, row)
+    ]
+    with open(os.path.join(directory, "tiles.json"), "w") as f:
+        json.dump(tiling.manifest(), f, indent=2, sort_keys=True)
+    if processes == 1 or len(jobs) < 2:
+        set_worker_tiling(tiling)
+        try:
+            return dict(render_tile(job) for job in jobs)
+        finally:
+            set_worker_tiling(None)
+    with Pool(processes, initializer=set_worker_tiling,
+              initargs=(tiling,)) as pool:
+        return dict(pool.imap_unordered(render_tile, jobs))
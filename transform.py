@@ -0,0 +1,72 @@
+import numpy as np
+
+
+class Affine:
+    """A 2D affine transform held as a 3x3 matrix and applied to whole
+    (n, 2) coordinate arrays at once.
+
+    Transforms compose with `@` the way matrices do: `(a @ b).apply(xy)`
+    is `a.apply(b.apply(xy))`. `then` reads left to right instead, which
+    suits chains of coordinate systems:
+
+        to_pixels = Affine.scale(1, -1).then(Affine.translate(10, 600))
+    """
+
+    def __init__(self, matrix=None):
+        self.matrix = np.identity(3) if matrix is None else \
+            np.asarray(matrix, dtype=np.float64)
+
+    @classmethod
+    def identity(cls):
+        return cls()
+
+    @classmethod
+    def scale(cls, sx, sy=None):
+        sy = sx if sy is None else sy
+        return cls([[sx, 0, 0], [0, sy, 0], [0, 0, 1]])
+
+    @classmethod
+    def translate(cls, tx, ty):
+        return cls([[1, 0, tx], [0, 1, ty], [0, 0, 1]])
+
+    def __matmul__(self, other):
+        return Affine(self.matrix @ other.matrix)
+
+    def then(self, other):
+        """This transform followed by `other`."""
+        return other @ self
+
+    def inverse(self):
+        return Affine(np.linalg.inv(self.matrix))
+
+    def apply(self, coords):
+        """Transforms an (n, 2) array, or an (..., 2) array of any shape,
+        with a single matrix multiply.
+        """
+        coords = np.asarray(coords, dtype=np.float64)
+        return coords @ self.matrix[:2, :2].T + self.matrix[:2, 2]
+
+    def apply_store(self, store):
+        """Returns a copy of a `PathStore` with every vertex transformed."""
+        return type(store).from_arrays(
+            self.apply(store.coords), store.offsets.copy())
+
+    def shapely_params(self):
+        """The [a, b, d, e, xoff, yoff] list that
+        `shapely.affinity.affine_transform` expects.
+        """
+        m = self.matrix
+        return [m[0, 0], m[0, 1], m[1, 0], m[1, 1], m[0, 2], m[1, 2]]
+
+    def svg(self):
+        """The transform as an SVG `transform` attribute value."""
+        a, b, d, e, xoff, yoff = self.shapely_params()
+        return "matrix({:g},{:g},{:g},{:g},{:g},{:g})".format(
+            a, d, b, e, xoff, yoff)
+
+    def __repr__(self):
+        return "Affine({})".format(self.matrix[:2].tolist())
+
+
+# plotter units to the y-up preview space both previews draw in
+PREVIEW_FLIP = Affine.scale(1, -1)
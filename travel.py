@@ -0,0 +1,251 @@
+import functools
+import math
+import numpy as np
+from store import PathStore
+
+
+def path_ends(store):
+    """Returns the first and last vertex of every path in a store."""
+    offsets = store.offsets
+    coords = store.coords
+    return coords[offsets[:-1]], coords[offsets[1:] - 1]
+
+
+def travel_distance(store, order=None, reverse=None, start=(0.0, 0.0)):
+    """Total pen-up distance needed to draw the paths of a store in
+    `order` (insertion order by default), flipping the paths marked in
+    `reverse`, starting with the pen at `start`.
+    """
+    if not len(store):
+        return 0.0
+    firsts, lasts = path_ends(store)
+    if order is not None:
+        firsts, lasts = firsts[order], lasts[order]
+    if reverse is not None:
+        reverse = np.asarray(reverse, dtype=bool)[:, None]
+        firsts, lasts = (
+            np.where(reverse, lasts, firsts),
+            np.where(reverse, firsts, lasts))
+    pen_positions = np.vstack([np.asarray(start, dtype=np.float64), lasts[:-1]])
+    return float(np.hypot(*(firsts - pen_positions).T).sum())
+
+
+@functools.lru_cache(maxsize=None)
+def ring(radius):
+    """Offsets of the grid cells exactly `radius` cells from the centre."""
+    return [
+        (dx, dy)
+        for dx in range(-radius, radius + 1)
+        for dy in range(-radius, radius + 1)
+        if max(abs(dx), abs(dy)) == radius
+    ]
+
+
+class _EndpointGrid:
+    """Uniform grid of path endpoints used to find the nearest unvisited
+    path without scanning every path.
+
+    Endpoint `k` is the start of path `k` for `k < n` and the end of path
+    `k - n` otherwise. Endpoints at the same spot share one site, so the
+    many paths meeting at a point cost a single distance check. Taken
+    endpoints are swap-removed from their site, and emptied sites from
+    their cell, so a lookup only ever looks at what is still unvisited.
+    """
+
+    def __init__(self, firsts, lasts):
+        self.count = len(firsts)
+        ends = np.vstack([firsts, lasts])
+        sites, site_of = np.unique(ends, axis=0, return_inverse=True)
+        site_of = site_of.ravel()
+        self.xs = sites[:, 0].tolist()
+        self.ys = sites[:, 1].tolist()
+        self.site_of = site_of.tolist()
+        # endpoints waiting at each site, and where each one sits there
+        ids = np.argsort(site_of, kind='stable')
+        bounds = np.searchsorted(site_of[ids], np.arange(len(sites) + 1))
+        self.stacks = [
+            ids[a:b].tolist() for a, b in zip(bounds[:-1], bounds[1:])]
+        self.stack_slot = (np.arange(len(ids)) - bounds[site_of[ids]])[
+            np.argsort(ids)].tolist()
+        self.sites = sites
+        self.cell_of = [None] * len(sites)
+        self.cell_slot = [0] * len(sites)
+        self.regrid(np.arange(len(sites)))
+
+    def regrid(self, live):
+        """Spreads the sites in `live` over a fresh grid sized for them.
+        Called again whenever most sites are gone, so the rings searched
+        around the pen never grow mostly empty.
+        """
+        sites = self.sites[live]
+        self.origin = sites.min(axis=0)
+        span = float(max((sites.max(axis=0) - self.origin).max(), 1.0))
+        self.size = span / max(math.sqrt(len(sites)), 1.0)
+        self.gridded = self.live = len(sites)
+        cells = np.floor((sites - self.origin) / self.size).astype(np.int64)
+        self.cells = {}
+        for site, key in zip(live.tolist(), zip(cells[:, 0].tolist(),
+                                                 cells[:, 1].tolist())):
+            members = self.cells.setdefault(key, [])
+            self.cell_of[site] = key
+            self.cell_slot[site] = len(members)
+            members.append(site)
+
+    def take(self, path):
+        """Removes both endpoints of a path."""
+        for k in (path, path + self.count):
+            site = self.site_of[k]
+            stack = self.stacks[site]
+            last = stack.pop()
+            if last != k:
+                slot = self.stack_slot[k]
+                stack[slot] = last
+                self.stack_slot[last] = slot
+            if not stack:
+                self.remove_site(site)
+
+    def remove_site(self, site):
+        key = self.cell_of[site]
+        members = self.cells[key]
+        last = members.pop()
+        if last != site:
+            slot = self.cell_slot[site]
+            members[slot] = last
+            self.cell_slot[last] = slot
+        if not members:
+            del self.cells[key]
+        self.live -= 1
+        if self.live and self.live * 4 < self.gridded:
+            self.regrid(np.array(
+                [site for members in self.cells.values()
+                 for site in members], dtype=np.int64))
+
+    def nearest(self, x, y):
+        """Returns an unvisited endpoint closest to (x, y)."""
+        cx = int(math.floor((x - self.origin[0]) / self.size))
+        cy = int(math.floor((y - self.origin[1]) / self.size))
+        best, best_distance = None, float('inf')
+        radius = 0
+        while self.cells:
+            full_scan = 8 * radius > len(self.cells)
+            if full_scan:
+                keys = list(self.cells)
+            elif radius == 0:
+                keys = [(cx, cy)]
+            else:
+                keys = [(cx + dx, cy + dy) for dx, dy in ring(radius)]
+            for key in keys:
+                for site in self.cells.get(key, ()):
+                    distance = math.hypot(
+                        self.xs[site] - x, self.ys[site] - y)
+                    if distance < best_distance:
+                        best, best_distance = site, distance
+            if best is not None and (
+                    full_scan or best_distance <= radius * self.size):
+                return self.stacks[best][-1]
+            radius += 1
+        return None if best is None else self.stacks[best][-1]
+
+
+def greedy_order(store, start=(0.0, 0.0)):
+    """Orders paths by repeatedly drawing the unvisited path with the end
+    nearest to the pen, flipping it if its last vertex is the nearer end.
+
+    Returns the path order and a boolean array of which paths (in that
+    order) should be drawn reversed.
+    """
+    count = len(store)
+    if not count:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=bool)
+    firsts, lasts = path_ends(store)
+    grid = _EndpointGrid(firsts, lasts)
+    order = []
+    reverse = []
+    x, y = float(start[0]), float(start[1])
+    for _ in range(count):
+        k = grid.nearest(x, y)
+        path, flipped = k % count, k >= count
+        grid.take(path)
+        order.append(path)
+        reverse.append(flipped)
+        x, y = (firsts if flipped else lasts)[path]
+    return np.array(order, dtype=np.int64), np.array(reverse, dtype=bool)
+
+
+def two_opt(store, order, reverse, start=(0.0, 0.0), window=20,
+            max_passes=4):
+    """Refines a path order with windowed 2-opt moves.
+
+    Reversing the run of paths `i..j` also flips each path in it, so a
+    move only changes the two pen-up hops at the edges of the run. Only
+    runs of up to `window` paths are tried, which keeps each pass linear
+    in the number of paths.
+    """
+    count = len(order)
+    if count < 3:
+        return order, reverse
+    firsts, lasts = path_ends(store)
+    order = list(order)
+    reverse = list(reverse)
+
+    def ends(position):
+        path = order[position]
+        if reverse[position]:
+            return lasts[path], firsts[path]
+        return firsts[path], lasts[path]
+
+    def distance(a, b):
+        return math.hypot(a[0] - b[0], a[1] - b[1])
+
+    start = (float(start[0]), float(start[1]))
+    for _ in range(max_passes):
+        improved = False
+        for i in range(count):
+            before = ends(i - 1)[1] if i else start
+            head = ends(i)[0]
+            for j in range(i + 1, min(i + window, count)):
+                tail = ends(j)[1]
+                after = ends(j + 1)[0] if j + 1 < count else None
+                old = distance(before, head)
+                new = distance(before, tail)
+                if after is not None:
+                    old += distance(tail, after)
+                    new += distance(head, after)
+                if new < old - 1e-9:
+                    order[i:j + 1] = order[i:j + 1][::-1]
+                    reverse[i:j + 1] = [not r for r in reverse[i:j + 1][::-1]]
+                    head = ends(i)[0]
+                    improved = True
+        if not improved:
+            break
+    return np.array(order, dtype=np.int64), np.array(reverse, dtype=bool)
+
+
+def reorder(store, order, reverse):
+    """Returns a new store with the paths of `store` in `order`, flipping
+    the ones marked in `reverse`.
+    """
+    offsets = store.offsets
+    lengths = np.diff(offsets)[order]
+    new_offsets = np.zeros(len(order) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_offsets[1:])
+    within = np.arange(new_offsets[-1]) - np.repeat(new_offsets[:-1], lengths)
+    flipped = np.repeat(np.asarray(reverse, dtype=bool), lengths)
+    within = np.where(flipped, np.repeat(lengths, lengths) - 1 - within, within)
+    source = np.repeat(offsets[:-1][order], lengths) + within
+    return PathStore.from_arrays(store.coords[source], new_offsets)
+
+
+def optimize(store, start=(0.0, 0.0), refine=False, **two_opt_options):
+    """Reorders and flips the paths of a store to cut pen-up travel.
+
+    Returns the new store along with the travel distance before and
+    after optimizing.
+    """
+    before = travel_distance(store, start=start)
+    order, reverse = greedy_order(store, start=start)
+    if refine:
+        order, reverse = two_opt(
+            store, order, reverse, start=start, **two_opt_options)
+    optimized = reorder(store, order, reverse)
+    return optimized, before, travel_distance(optimized, start=start)